@@ -233,6 +233,9 @@ class IntentConfigAPI:
             if "instructive_patterns" in safety_updates:
                 safety_config.instructive_patterns = safety_updates["instructive_patterns"]
             
+            # 模式列表变化后重新编译匹配器
+            safety_config.build_matcher()
+            
             if "custom_safety_rules" in safety_updates:
                 safety_config.custom_safety_rules.update(safety_updates["custom_safety_rules"])
             
@@ -17,7 +17,8 @@ from typing import Dict, Any
 from common.logging_utils import logger_manager
 from handler.query_processor import QueryProcessor
 from core.intent_recognition import ProcessorConfig
-from core.common.llm_client import create_llm_function
+from common.config import settings
+from core.common.llm_client import create_llm_function, create_embedding_function
 
 logger = logger_manager.get_logger("intent_api")
 
@@ -25,19 +26,28 @@ logger = logger_manager.get_logger("intent_api")
 query_processor = None
 # 全局LLM函数
 _llm_func = None
+# 全局Embedding函数（供意图识别结果缓存做相似查询匹配）
+_embedding_func = None
 # LLM初始化状态
 _llm_initialized = False
 
 
 async def initialize_llm():
     """初始化LLM函数"""
-    global _llm_func, _llm_initialized
+    global _llm_func, _embedding_func, _llm_initialized
     if not _llm_initialized:
         try:
             _llm_func = await create_llm_function(chat_template_kwargs={"enable_thinking": False})
             _llm_initialized = True
             if _llm_func:
                 logger.info("LLM函数初始化成功")
+                if settings.intent_result_cache:
+                    try:
+                        _embedding_func = await create_embedding_function()
+                    except Exception as e:
+                        # 无Embedding时结果缓存仅做精确匹配
+                        logger.warning(f"Embedding函数初始化异常，意图结果缓存仅精确匹配: {e}")
+                        _embedding_func = None
             else:
                 logger.warning("LLM函数初始化失败，将使用DFA回退模式")
         except Exception as e:
@@ -71,7 +81,7 @@ async def get_query_processor() -> QueryProcessor:
             enable_dfa_filter=True,  # 始终启用DFA作为回退
             enable_query_enhancement=True
         )
-        query_processor = QueryProcessor(llm_func=_llm_func, config=config)
+        query_processor = QueryProcessor(llm_func=_llm_func, config=config, embedding_func=_embedding_func)
 
         if _llm_func is not None:
             logger.info("查询处理器初始化完成 - 启用大模型优先模式")
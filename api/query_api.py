@@ -16,7 +16,7 @@ from model import (
 )
 from handler import guixiaoxirag_service, QueryProcessor
 from common.logging_utils import logger_manager
-from common.constants import QUERY_MODE_DESCRIPTIONS, SUPPORTED_QUERY_MODES
+from common.constants import QUERY_MODE_DESCRIPTIONS, SUPPORTED_QUERY_MODE_SET
 from common.utils import get_query_mode_info
 
 
@@ -36,7 +36,7 @@ class QueryAPI:
             if not request.query.strip():
                 raise HTTPException(status_code=400, detail="查询内容不能为空")
             
-            if request.mode not in SUPPORTED_QUERY_MODES:
+            if request.mode not in SUPPORTED_QUERY_MODE_SET:
                 raise HTTPException(status_code=400, detail=f"不支持的查询模式: {request.mode}")
             
             # 构建查询参数
@@ -11,7 +11,7 @@ from model import (
     HealthResponse, SystemStatus
 )
 from handler import guixiaoxirag_service
-from common.config import settings
+from common.config import settings, reload_settings
 from common.logging_utils import logger_manager
 
 
@@ -322,6 +322,9 @@ class SystemAPI:
                 settings.log_level = request.log_level
                 updated_fields.append("log_level")
             
+            if updated_fields:
+                reload_settings()
+            
             # 获取更新后的有效配置
             effective_config_response = await self.get_effective_config()
             
@@ -3,6 +3,7 @@ GuiXiaoXiRag FastAPI服务配置文件
 优化版本 - 支持 .env 文件和环境变量配置
 """
 import os
+from functools import cache
 from pathlib import Path
 from typing import Optional, List, Dict
 try:
@@ -61,6 +62,8 @@ class Settings(BaseSettings):
     working_dir: str = Field(default="./data/knowledgeBase/default", description="知识库工作目录")
     qa_storage_dir: Optional[str] = Field(default="./data/Q_A_Base", description="QA存储目录")
     intent_config_path: str = Field(default="./data/custom_intents", description="意图识别配置路径")
+    kg_verify_content: bool = Field(default=False, description="GraphML指纹变化时校验内容哈希，内容未变则跳过JSON转换")
+    kg_parallel_threshold: int = Field(default=10 * 1024 * 1024, description="GraphML文件超过该大小(字节)时并行提取节点和边")
 
     # 大模型配置 - 支持用户自定义，未配置时使用默认值
     openai_api_base: str = Field(default="http://localhost:8100/v1", description="OpenAI API 基础URL")
@@ -78,6 +81,15 @@ class Settings(BaseSettings):
     llm_temperature: float = Field(default=0.1, description="LLM温度参数")
     llm_max_tokens: int = Field(default=2048, description="LLM最大token数")
     llm_timeout: int = Field(default=240, description="LLM请求超时时间(秒)")
+    llm_semantic_cache: bool = Field(default=False, description="启用LLM语义缓存（相似提示词直接复用历史回答）")
+    llm_semantic_cache_threshold: float = Field(default=0.97, description="LLM语义缓存命中的余弦相似度阈值")
+    llm_semantic_cache_size: int = Field(default=5000, description="LLM语义缓存最大条目数")
+    intent_result_cache: bool = Field(default=True, description="启用意图识别结果缓存（相同或相似查询复用大模型的安全检查/意图分析/查询增强结果）")
+    intent_result_cache_size: int = Field(default=2000, description="意图识别结果缓存每类结果的最大条目数")
+    intent_safety_cache_threshold: float = Field(default=0.95, description="安全检查结果语义复用的余弦相似度阈值（还需命中的风险关键词完全一致）")
+    intent_analysis_cache_threshold: float = Field(default=0.92, description="意图分析结果语义复用的余弦相似度阈值")
+    intent_llm_combined_analysis: bool = Field(default=True, description="意图识别将安全检查、意图分析、查询增强合并为一次大模型调用（自定义了单项提示词时自动改为分项调用）")
+    intent_llm_max_concurrency: int = Field(default=8, description="意图识别处理器同时在途的大模型请求上限")
 
     # Embedding配置
     embedding_enabled: bool = Field(default=True, description="启用Embedding服务")
@@ -109,6 +121,7 @@ class Settings(BaseSettings):
     # 日志配置
     log_level: str = Field(default="INFO", description="日志级别")
     log_dir: str = Field(default="./logs", description="日志目录")
+    log_batch_write: bool = Field(default=False, description="日志批量写入（缓冲后按大小或时间间隔写出）")
 
     # 文件上传配置
     max_file_size: int = Field(default=50 * 1024 * 1024, description="最大文件大小(字节)")
@@ -228,13 +241,16 @@ def validate_config():
     if not settings.openai_embedding_api_base.startswith(('http://', 'https://')):
         errors.append(f"Embedding API基础URL格式无效: {settings.openai_embedding_api_base}")
 
-    # 验证目录路径
-    try:
-        Path(settings.working_dir).resolve()
-        Path(settings.log_dir).resolve()
-        Path(settings.upload_dir).resolve()
-    except Exception as e:
-        errors.append(f"目录路径无效: {e}")
+    # 验证目录路径（仅做语法检查，不访问文件系统）
+    for label, directory in (
+        ("working_dir", settings.working_dir),
+        ("log_dir", settings.log_dir),
+        ("upload_dir", settings.upload_dir),
+    ):
+        try:
+            os.fspath(directory)
+        except TypeError as e:
+            errors.append(f"目录路径无效({label}): {e}")
 
     # 验证文件大小
     if settings.max_file_size <= 0:
@@ -254,6 +270,7 @@ def validate_config():
     return len(errors) == 0
 
 
+@cache
 def get_effective_config():
     """获取有效的配置信息，处理用户自定义和默认值"""
     config = {
@@ -298,6 +315,7 @@ def get_effective_config():
     return config
 
 
+@cache
 def get_llm_config():
     """获取LLM配置"""
     provider = settings.llm_provider.lower()
@@ -340,6 +358,7 @@ def get_llm_config():
         return base_config
 
 
+@cache
 def get_embedding_config():
     """获取Embedding配置"""
     provider = settings.embedding_provider.lower()
@@ -381,6 +400,7 @@ def get_embedding_config():
         return base_config
 
 
+@cache
 def get_rerank_config():
     """获取Rerank配置"""
     provider = settings.rerank_provider.lower()
@@ -416,6 +436,7 @@ def get_rerank_config():
         return base_config
 
 
+@cache
 def get_config_summary():
     """获取配置摘要信息"""
     effective_config = get_effective_config()
@@ -437,6 +458,22 @@ def get_config_summary():
     }
 
 
+def reload_settings():
+    """清空派生配置缓存
+
+    settings 在运行时被修改（如配置更新接口、性能模式切换）后调用，
+    使 get_*_config 系列函数重新计算。
+    """
+    for func in (
+        get_effective_config,
+        get_llm_config,
+        get_embedding_config,
+        get_rerank_config,
+        get_config_summary,
+    ):
+        func.cache_clear()
+
+
 # 初始化目录
 ensure_directories()
 
@@ -450,5 +487,6 @@ __all__ = [
     "get_llm_config",
     "get_embedding_config",
     "get_rerank_config",
+    "reload_settings",
     "get_project_root"
 ]
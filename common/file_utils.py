@@ -2,28 +2,34 @@
 文件处理工具函数
 """
 import os
-import zipfile
 import json
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Dict, Any, Optional, List
+import aiofiles
 import docx2txt
 import textract
 from fastapi import UploadFile, HTTPException
 
 from .config import settings
-from .constants import SUPPORTED_FILE_TYPES, FILE_TYPE_DESCRIPTIONS
+from .constants import SUPPORTED_FILE_TYPE_SET, FILE_TYPE_DESCRIPTIONS
 from .logging_utils import get_logger
 
 logger = get_logger(__name__)
 
+# ZIP本地文件头魔数（docx本质上是zip包）
+_ZIP_MAGIC = b'PK\x03\x04'
+
+# 上传文件分块读取大小
+_UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 def is_docx(file_path: str) -> bool:
-    """检查文件是否为docx格式"""
+    """检查文件是否为docx格式（仅嗅探文件头，不解析zip目录）"""
     try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            return True
-    except zipfile.BadZipFile:
+        with open(file_path, 'rb') as f:
+            return f.read(4) == _ZIP_MAGIC
+    except OSError:
         return False
 
 
@@ -146,6 +152,15 @@ def _extract_code_file(file_path: str) -> str:
     return _extract_text_file(file_path)
 
 
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """分块读取上传文件内容"""
+    while True:
+        chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
 async def process_uploaded_file(file: UploadFile) -> Dict[str, Any]:
     """处理上传的文件"""
     # 检查文件大小
@@ -157,7 +172,7 @@ async def process_uploaded_file(file: UploadFile) -> Dict[str, Any]:
     
     # 检查文件类型
     file_extension = Path(file.filename).suffix.lower()
-    if file_extension not in SUPPORTED_FILE_TYPES:
+    if file_extension not in SUPPORTED_FILE_TYPE_SET:
         raise HTTPException(
             status_code=400,
             detail=f"不支持的文件类型: {file_extension}"
@@ -172,10 +187,12 @@ async def process_uploaded_file(file: UploadFile) -> Dict[str, Any]:
     file_path = os.path.join(settings.upload_dir, unique_filename)
     
     try:
-        # 保存文件
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # 分块异步保存文件，避免阻塞事件循环
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as out:
+            async for chunk in _iter_upload(file):
+                await out.write(chunk)
+                file_size += len(chunk)
         
         # 提取文本内容
         text_content = extract_text_from_file(file_path)
@@ -183,7 +200,7 @@ async def process_uploaded_file(file: UploadFile) -> Dict[str, Any]:
         return {
             "filename": file.filename,
             "file_path": file_path,
-            "file_size": len(content),
+            "file_size": file_size,
             "content": text_content,
             "file_type": file_extension,
             "file_type_description": FILE_TYPE_DESCRIPTIONS.get(file_extension, "未知类型")
@@ -205,7 +222,7 @@ def get_file_contents(directory_path: str) -> List[str]:
         raise ValueError(f"目录不存在: {directory_path}")
     
     for file_path in directory.rglob("*"):
-        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_FILE_TYPES:
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_FILE_TYPE_SET:
             try:
                 content = extract_text_from_file(str(file_path))
                 contents.append(content)
@@ -220,7 +237,7 @@ def get_file_contents(directory_path: str) -> List[str]:
 def validate_file_type(filename: str) -> bool:
     """验证文件类型是否支持"""
     file_extension = Path(filename).suffix.lower()
-    return file_extension in SUPPORTED_FILE_TYPES
+    return file_extension in SUPPORTED_FILE_TYPE_SET
 
 
 def get_file_info(file_path: str) -> Dict[str, Any]:
@@ -2,24 +2,207 @@
 日志工具函数
 """
 import os
+import atexit
+import queue
 import logging
 import logging.handlers
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Set
 from .config import settings
 
 
+# 进程内已确认存在的日志目录
+_ensured_log_dirs: Set[str] = set()
+
+# 每个日志文件对应一个队列监听器，真实的处理器只在监听线程中执行
+_queue_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_queue_listeners_lock = threading.Lock()
+
+
+def _stop_queue_listeners():
+    """停止所有队列监听器并刷新剩余日志"""
+    with _queue_listeners_lock:
+        for listener in _queue_listeners.values():
+            listener.stop()
+        _queue_listeners.clear()
+
+
+atexit.register(_stop_queue_listeners)
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """批量写入的轮转文件处理器
+
+    格式化后的日志先累积在内存缓冲区中，缓冲区达到 flush_bytes、距上次写出
+    超过 flush_interval 秒或出现 ERROR 及以上级别日志时一次性写出，
+    将每条日志一次 write 系统调用摊薄为每批一次。
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        maxBytes: int = 0,
+        backupCount: int = 0,
+        encoding: Optional[str] = None,
+        delay: bool = False,
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 1.0
+    ):
+        super().__init__(
+            filename,
+            maxBytes=maxBytes,
+            backupCount=backupCount,
+            encoding=encoding,
+            delay=delay
+        )
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._buffered_size = 0
+        self._last_flush = time.monotonic()
+        self._stop_event = threading.Event()
+        self._flush_thread = threading.Thread(
+            target=self._flush_periodically,
+            name="log-batch-flush",
+            daemon=True
+        )
+        self._flush_thread.start()
+
+    def _flush_periodically(self):
+        """定时写出缓冲区，避免低流量时日志长时间滞留"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _encoded_size(self, msg: str) -> int:
+        """日志写入文件后的字节数（maxBytes 与 tell() 均按字节计）"""
+        return len(msg.encode(self.encoding or "utf-8", errors="replace"))
+
+    def _should_rollover(self, size: int) -> bool:
+        """按已写出大小加缓冲区大小（字节）判断写入 size 字节后是否需要轮转"""
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() + self._buffered_size + size >= self.maxBytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """按已写出大小加缓冲区大小判断是否需要轮转"""
+        if self.maxBytes <= 0:
+            return False
+        return self._should_rollover(self._encoded_size(f"{self.format(record)}{self.terminator}"))
+
+    def emit(self, record: logging.LogRecord):
+        """格式化日志并写入缓冲区（每条日志只格式化一次）"""
+        try:
+            msg = f"{self.format(record)}{self.terminator}"
+            size = self._encoded_size(msg)
+            if self._should_rollover(size):
+                self.flush()
+                self.doRollover()
+            self.acquire()
+            try:
+                self._buffer.append(msg)
+                self._buffered_size += size
+                should_flush = (
+                    self._buffered_size >= self.flush_bytes
+                    or record.levelno >= logging.ERROR
+                    or time.monotonic() - self._last_flush >= self.flush_interval
+                )
+            finally:
+                self.release()
+            if should_flush:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """一次性写出缓冲区中的全部日志"""
+        self.acquire()
+        try:
+            if self._buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write("".join(self._buffer))
+                self._buffer.clear()
+                self._buffered_size = 0
+            self._last_flush = time.monotonic()
+            super().flush()
+        finally:
+            self.release()
+
+    def close(self):
+        """停止定时线程并写出剩余日志"""
+        self._stop_event.set()
+        self.flush()
+        super().close()
+
+
+def _create_sink_handlers(file_path: str, formatter: logging.Formatter) -> List[logging.Handler]:
+    """创建实际写出日志的处理器（控制台 + 文件）"""
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers: List[logging.Handler] = [console_handler]
+
+    # 使用RotatingFileHandler避免日志文件过大，添加延迟参数避免文件锁定
+    handler_class = (
+        BatchingRotatingFileHandler if settings.log_batch_write
+        else logging.handlers.RotatingFileHandler
+    )
+    try:
+        file_handler = handler_class(
+            file_path,
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8',
+            delay=True  # 延迟创建文件，避免启动时的文件锁定问题
+        )
+    except (OSError, PermissionError) as e:
+        # 如果文件被锁定，使用控制台日志
+        print(f"警告: 无法创建日志文件 {file_path}: {e}")
+        print("将仅使用控制台日志")
+        return handlers
+    file_handler.setFormatter(formatter)
+    handlers.append(file_handler)
+
+    return handlers
+
+
+def _get_queue_handler(file_path: str, formatter: logging.Formatter) -> logging.handlers.QueueHandler:
+    """获取写入指定日志文件的队列处理器，必要时启动对应的监听线程"""
+    with _queue_listeners_lock:
+        listener = _queue_listeners.get(file_path)
+        if listener is None:
+            log_queue = queue.Queue(-1)
+            listener = logging.handlers.QueueListener(
+                log_queue,
+                *_create_sink_handlers(file_path, formatter),
+                respect_handler_level=True
+            )
+            listener.start()
+            _queue_listeners[file_path] = listener
+
+    return logging.handlers.QueueHandler(listener.queue)
+
+
 def setup_logging(
     logger_name: Optional[str] = None,
     log_level: Optional[str] = None,
     log_file: Optional[str] = None
 ):
-    """设置日志配置"""
+    """设置日志配置
+
+    日志器上只挂载 QueueHandler，调用线程仅执行非阻塞的入队操作；
+    控制台输出、文件写入和日志轮转都在后台监听线程中完成。
+    """
     # 使用配置中的日志级别
     level = log_level or settings.log_level
     
-    # 确保日志目录存在
-    os.makedirs(settings.log_dir, exist_ok=True)
+    # 确保日志目录存在（每个目录在进程内只创建一次）
+    if settings.log_dir not in _ensured_log_dirs:
+        Path(settings.log_dir).mkdir(parents=True, exist_ok=True)
+        _ensured_log_dirs.add(settings.log_dir)
     
     # 配置日志格式
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -39,33 +222,13 @@ def setup_logging(
     # 清除现有处理器
     logger.handlers.clear()
     
-    # 添加控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # 添加文件处理器
+    # 确定日志文件路径
     if log_file:
         file_path = os.path.join(settings.log_dir, log_file)
     else:
         file_path = os.path.join(settings.log_dir, "guixiaoxirag_service.log")
     
-    # 使用RotatingFileHandler避免日志文件过大，添加延迟参数避免文件锁定
-    try:
-        file_handler = logging.handlers.RotatingFileHandler(
-            file_path,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8',
-            delay=True  # 延迟创建文件，避免启动时的文件锁定问题
-        )
-    except (OSError, PermissionError) as e:
-        # 如果文件被锁定，使用控制台日志
-        print(f"警告: 无法创建日志文件 {file_path}: {e}")
-        print("将仅使用控制台日志")
-        return logger
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    logger.addHandler(_get_queue_handler(file_path, formatter))
     
     return logger
 
@@ -110,42 +273,53 @@ class ContextualLogger:
     def __init__(self, logger: logging.Logger, context: dict = None):
         self.logger = logger
         self.context = context or {}
+        self._context_str = self._build_context_str()
+    
+    def _build_context_str(self) -> str:
+        """构建上下文字符串，仅在上下文变化时调用"""
+        return " ".join(f"{k}={v}" for k, v in self.context.items())
     
     def _format_message(self, message: str) -> str:
         """格式化消息，添加上下文信息"""
-        if self.context:
-            context_str = " ".join([f"{k}={v}" for k, v in self.context.items()])
-            return f"{message} [上下文: {context_str}]"
+        if self._context_str:
+            return f"{message} [上下文: {self._context_str}]"
         return message
     
+    def _log(self, level: int, message: str, **kwargs):
+        """级别未启用时直接返回，不再拼接上下文字符串"""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, self._format_message(message), **kwargs)
+    
     def debug(self, message: str, **kwargs):
         """记录调试日志"""
-        self.logger.debug(self._format_message(message), **kwargs)
+        self._log(logging.DEBUG, message, **kwargs)
     
     def info(self, message: str, **kwargs):
         """记录信息日志"""
-        self.logger.info(self._format_message(message), **kwargs)
+        self._log(logging.INFO, message, **kwargs)
     
     def warning(self, message: str, **kwargs):
         """记录警告日志"""
-        self.logger.warning(self._format_message(message), **kwargs)
+        self._log(logging.WARNING, message, **kwargs)
     
     def error(self, message: str, **kwargs):
         """记录错误日志"""
-        self.logger.error(self._format_message(message), **kwargs)
+        self._log(logging.ERROR, message, **kwargs)
     
     def critical(self, message: str, **kwargs):
         """记录严重错误日志"""
-        self.logger.critical(self._format_message(message), **kwargs)
+        self._log(logging.CRITICAL, message, **kwargs)
     
     def add_context(self, **kwargs):
         """添加上下文信息"""
         self.context.update(kwargs)
+        self._context_str = self._build_context_str()
     
     def remove_context(self, *keys):
         """移除上下文信息"""
         for key in keys:
             self.context.pop(key, None)
+        self._context_str = self._build_context_str()
 
 
 class LoggerManager:
@@ -185,6 +359,7 @@ logger_manager = LoggerManager()
 __all__ = [
     "setup_logging",
     "get_logger", 
+    "BatchingRotatingFileHandler",
     "log_performance",
     "log_error_with_context",
     "log_api_request",
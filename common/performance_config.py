@@ -2,8 +2,12 @@
 性能优化配置
 优化版本 - 更好的配置管理和性能调优
 """
-from typing import Dict, Any
-from .config import settings
+from collections import deque
+from functools import lru_cache
+from statistics import fmean
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
+from .config import settings, reload_settings
 from .constants import PERFORMANCE_MODES, DEFAULT_CONFIG
 
 
@@ -11,17 +15,17 @@ class PerformanceConfig:
     """性能优化配置类"""
     
     # 基础性能配置
-    BASIC_CONFIG = {
+    BASIC_CONFIG = MappingProxyType({
         "embedding_dim": 1536,  # 降低embedding维度以提高速度
         "max_token_size": 4096,  # 减少token大小
         "max_async": 4,  # 限制并发数
         "chunk_size": 512,  # 优化chunk大小
         "enable_cache": True,
         "cache_size": 500,
-    }
+    })
     
     # 高性能配置（适合生产环境）
-    HIGH_PERFORMANCE_CONFIG = {
+    HIGH_PERFORMANCE_CONFIG = MappingProxyType({
         "embedding_dim": 2560,  # 保持高质量
         "max_token_size": 8192,
         "max_async": 8,
@@ -30,10 +34,10 @@ class PerformanceConfig:
         "cache_size": 1000,
         "enable_parallel_processing": True,
         "batch_size": 20,
-    }
+    })
     
     # 快速测试配置
-    FAST_TEST_CONFIG = {
+    FAST_TEST_CONFIG = MappingProxyType({
         "embedding_dim": 768,   # 最小维度
         "max_token_size": 2048,
         "max_async": 2,
@@ -41,10 +45,10 @@ class PerformanceConfig:
         "enable_cache": True,
         "cache_size": 100,
         "enable_parallel_processing": False,
-    }
+    })
     
     # 内存优化配置
-    MEMORY_OPTIMIZED_CONFIG = {
+    MEMORY_OPTIMIZED_CONFIG = MappingProxyType({
         "embedding_dim": 1024,
         "max_token_size": 4096,
         "max_async": 2,
@@ -52,21 +56,23 @@ class PerformanceConfig:
         "enable_cache": False,  # 禁用缓存以节省内存
         "batch_size": 5,
         "enable_streaming": True,
-    }
+    })
+    
+    # 模式名到配置的映射
+    MODE_CONFIGS = MappingProxyType({
+        "basic": BASIC_CONFIG,
+        "high_performance": HIGH_PERFORMANCE_CONFIG,
+        "fast_test": FAST_TEST_CONFIG,
+        "memory_optimized": MEMORY_OPTIMIZED_CONFIG,
+    })
     
     @classmethod
-    def get_config(cls, mode: str = "basic") -> Dict[str, Any]:
-        """获取指定模式的配置"""
-        configs = {
-            "basic": cls.BASIC_CONFIG,
-            "high_performance": cls.HIGH_PERFORMANCE_CONFIG,
-            "fast_test": cls.FAST_TEST_CONFIG,
-            "memory_optimized": cls.MEMORY_OPTIMIZED_CONFIG,
-        }
-        return configs.get(mode, cls.BASIC_CONFIG)
+    def get_config(cls, mode: str = "basic") -> Mapping[str, Any]:
+        """获取指定模式的配置（只读）"""
+        return cls.MODE_CONFIGS.get(mode, cls.BASIC_CONFIG)
     
     @classmethod
-    def apply_config(cls, mode: str = "basic") -> Dict[str, Any]:
+    def apply_config(cls, mode: str = "basic") -> Mapping[str, Any]:
         """应用性能配置"""
         config = cls.get_config(mode)
         
@@ -74,6 +80,7 @@ class PerformanceConfig:
         for key, value in config.items():
             if hasattr(settings, key):
                 setattr(settings, key, value)
+        reload_settings()
         
         return config
     
@@ -97,105 +104,109 @@ class PerformanceConfig:
 
 
 # 查询性能优化配置
-QUERY_OPTIMIZATION = {
-    "local_mode": {
+QUERY_OPTIMIZATION = MappingProxyType({
+    "local_mode": MappingProxyType({
         "top_k": 10,
         "max_entity_tokens": 2000,
         "max_relation_tokens": 1000,
         "enable_rerank": True,
         "timeout": 30,
-    },
-    "global_mode": {
+    }),
+    "global_mode": MappingProxyType({
         "top_k": 15,
         "max_entity_tokens": 3000,
         "max_relation_tokens": 2000,
         "enable_rerank": True,
         "timeout": 45,
-    },
-    "hybrid_mode": {
+    }),
+    "hybrid_mode": MappingProxyType({
         "top_k": 20,
         "max_entity_tokens": 4000,
         "max_relation_tokens": 3000,
         "enable_rerank": True,
         "timeout": 60,
-    },
-    "naive_mode": {
+    }),
+    "naive_mode": MappingProxyType({
         "top_k": 5,
         "max_entity_tokens": 1000,
         "max_relation_tokens": 500,
         "enable_rerank": False,
         "timeout": 15,
-    },
-    "mix_mode": {
+    }),
+    "mix_mode": MappingProxyType({
         "top_k": 25,
         "max_entity_tokens": 5000,
         "max_relation_tokens": 4000,
         "enable_rerank": True,
         "timeout": 90,
-    },
-    "bypass_mode": {
+    }),
+    "bypass_mode": MappingProxyType({
         "top_k": 1,
         "max_entity_tokens": 100,
         "max_relation_tokens": 50,
         "enable_rerank": False,
         "timeout": 5,
-    }
-}
+    })
+})
+
 
+@lru_cache(maxsize=32)
+def get_optimized_query_params(mode: str, performance_level: str = "balanced") -> Mapping[str, Any]:
+    """获取优化的查询参数
 
-def get_optimized_query_params(mode: str, performance_level: str = "balanced") -> Dict[str, Any]:
-    """获取优化的查询参数"""
+    结果只依赖于 (mode, performance_level)，因此做缓存并以只读映射返回。
+    """
     base_params = QUERY_OPTIMIZATION.get(f"{mode}_mode", QUERY_OPTIMIZATION["hybrid_mode"])
     
     if performance_level == "fast":
         # 快速模式：减少参数以提高速度
-        return {
+        return MappingProxyType({
             **base_params,
             "top_k": max(5, base_params["top_k"] // 2),
             "max_entity_tokens": base_params["max_entity_tokens"] // 2,
             "max_relation_tokens": base_params["max_relation_tokens"] // 2,
             "enable_rerank": False,
             "timeout": base_params["timeout"] // 2,
-        }
+        })
     elif performance_level == "quality":
         # 质量模式：增加参数以提高质量
-        return {
+        return MappingProxyType({
             **base_params,
             "top_k": min(50, base_params["top_k"] * 2),
             "max_entity_tokens": base_params["max_entity_tokens"] * 2,
             "max_relation_tokens": base_params["max_relation_tokens"] * 2,
             "enable_rerank": True,
             "timeout": base_params["timeout"] * 2,
-        }
+        })
     else:
         # 平衡模式
         return base_params
 
 
 # 批处理优化配置
-BATCH_PROCESSING_CONFIG = {
-    "small_batch": {
+BATCH_PROCESSING_CONFIG = MappingProxyType({
+    "small_batch": MappingProxyType({
         "max_batch_size": 5,
         "batch_timeout": 15,
         "parallel_workers": 2,
         "chunk_overlap": 25,
-    },
-    "medium_batch": {
+    }),
+    "medium_batch": MappingProxyType({
         "max_batch_size": 10,
         "batch_timeout": 30,
         "parallel_workers": 4,
         "chunk_overlap": 50,
-    },
-    "large_batch": {
+    }),
+    "large_batch": MappingProxyType({
         "max_batch_size": 20,
         "batch_timeout": 60,
         "parallel_workers": 8,
         "chunk_overlap": 100,
-    }
-}
+    })
+})
 
 
-def get_batch_config(batch_size: int) -> Dict[str, Any]:
+def get_batch_config(batch_size: int) -> Mapping[str, Any]:
     """根据批处理大小获取优化配置"""
     if batch_size <= 5:
         return BATCH_PROCESSING_CONFIG["small_batch"]
@@ -206,62 +217,62 @@ def get_batch_config(batch_size: int) -> Dict[str, Any]:
 
 
 # 缓存配置
-CACHE_CONFIG = {
-    "minimal": {
+CACHE_CONFIG = MappingProxyType({
+    "minimal": MappingProxyType({
         "enable_llm_cache": False,
         "enable_embedding_cache": True,
         "cache_ttl": 1800,  # 30分钟
         "max_cache_size": 100,
-    },
-    "standard": {
+    }),
+    "standard": MappingProxyType({
         "enable_llm_cache": True,
         "enable_embedding_cache": True,
         "cache_ttl": 3600,  # 1小时
         "max_cache_size": 500,
-    },
-    "aggressive": {
+    }),
+    "aggressive": MappingProxyType({
         "enable_llm_cache": True,
         "enable_embedding_cache": True,
         "cache_ttl": 7200,  # 2小时
         "max_cache_size": 1000,
         "enable_persistent_cache": True,
-    }
-}
+    })
+})
 
 
-def get_cache_config(mode: str = "standard") -> Dict[str, Any]:
+def get_cache_config(mode: str = "standard") -> Mapping[str, Any]:
     """获取缓存配置"""
     return CACHE_CONFIG.get(mode, CACHE_CONFIG["standard"])
 
 
 # 监控和日志配置
-MONITORING_CONFIG = {
-    "development": {
+MONITORING_CONFIG = MappingProxyType({
+    "development": MappingProxyType({
         "enable_performance_monitoring": True,
         "log_slow_requests": True,
         "slow_request_threshold": 5.0,
         "enable_metrics_collection": False,
         "metrics_interval": 300,  # 5分钟
         "log_level": "DEBUG",
-    },
-    "production": {
+    }),
+    "production": MappingProxyType({
         "enable_performance_monitoring": True,
         "log_slow_requests": True,
         "slow_request_threshold": 10.0,
         "enable_metrics_collection": True,
         "metrics_interval": 60,  # 1分钟
         "log_level": "INFO",
-    },
-    "minimal": {
+    }),
+    "minimal": MappingProxyType({
         "enable_performance_monitoring": False,
         "log_slow_requests": False,
         "enable_metrics_collection": False,
         "log_level": "WARNING",
-    }
-}
+    })
+})
 
 
-def get_monitoring_config(environment: str = "development") -> Dict[str, Any]:
+def get_monitoring_config(environment: str = "development") -> Mapping[str, Any]:
     """获取监控配置"""
     return MONITORING_CONFIG.get(environment, MONITORING_CONFIG["development"])
 
@@ -272,30 +283,31 @@ class AdaptivePerformanceManager:
     
     def __init__(self):
         self.current_mode = "basic"
-        self.performance_history = []
+        # 保持最近100条记录，超出后自动淘汰最旧记录
+        self.performance_history = deque(maxlen=100)
+        # 最近10条记录的滑动窗口，供优化建议使用
+        self._recent_metrics = deque(maxlen=10)
         self.adjustment_threshold = 0.1  # 10%性能变化阈值
     
     def record_performance(self, response_time: float, memory_usage: float, cpu_usage: float):
         """记录性能指标"""
-        self.performance_history.append({
+        metrics = {
             "response_time": response_time,
             "memory_usage": memory_usage,
             "cpu_usage": cpu_usage
-        })
-        
-        # 保持最近100条记录
-        if len(self.performance_history) > 100:
-            self.performance_history.pop(0)
+        }
+        self.performance_history.append(metrics)
+        self._recent_metrics.append(metrics)
     
     def suggest_optimization(self) -> Dict[str, Any]:
         """建议性能优化"""
         if len(self.performance_history) < 10:
             return {"suggestion": "需要更多性能数据"}
         
-        recent_metrics = self.performance_history[-10:]
-        avg_response_time = sum(m["response_time"] for m in recent_metrics) / len(recent_metrics)
-        avg_memory_usage = sum(m["memory_usage"] for m in recent_metrics) / len(recent_metrics)
-        avg_cpu_usage = sum(m["cpu_usage"] for m in recent_metrics) / len(recent_metrics)
+        recent_metrics = self._recent_metrics
+        avg_response_time = fmean(m["response_time"] for m in recent_metrics)
+        avg_memory_usage = fmean(m["memory_usage"] for m in recent_metrics)
+        avg_cpu_usage = fmean(m["cpu_usage"] for m in recent_metrics)
         
         suggestions = []
         
@@ -2,30 +2,74 @@
 通用工具函数
 """
 import os
+import re
 import json
+import hashlib
+import mmap
+import multiprocessing
+import platform
+import secrets
+import shutil
+import tempfile
+import uuid
 import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterable, Iterator, Optional, List, Tuple
 import asyncio
+import functools
 import time
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # orjson不可用时使用标准库json
+    orjson = None
+
+try:
+    import psutil
+except ImportError:  # psutil不可用时只返回基础系统信息
+    psutil = None
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # lxml不可用时回退到标准库解析器
+    _lxml_etree = None
+
 from .config import settings
-from .constants import SUPPORTED_QUERY_MODES, QUERY_MODE_DESCRIPTIONS
+from .constants import SUPPORTED_QUERY_MODE_SET, QUERY_MODE_DESCRIPTIONS
 from .logging_utils import get_logger
 
 logger = get_logger(__name__)
 
 
+# 预编译的文本处理正则
+_WS_RE = re.compile(r'\s+')
+_CLEAN_RE = re.compile(r'[^\w\s\u4e00-\u9fff.,!?;:()[\]{}"\'-]')
+_WORD_RE = re.compile(r'\b\w+\b')
+_FNAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# 文件大小单位
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# 关键词提取使用的停用词（简化版）
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    '的', '了', '在', '是', '我', '你', '他', '她', '它', '们', '这', '那', '有', '没', '不', '也', '都', '很', '就', '还'
+})
+
+
 def validate_query_mode(mode: str) -> bool:
     """验证查询模式是否有效"""
-    return mode in SUPPORTED_QUERY_MODES
+    return mode in SUPPORTED_QUERY_MODE_SET
 
 
 def get_query_mode_info() -> Dict[str, Any]:
     """获取查询模式信息"""
     return {
-        "modes": QUERY_MODE_DESCRIPTIONS,
+        "modes": dict(QUERY_MODE_DESCRIPTIONS),
         "default": "hybrid",
         "recommended": ["hybrid", "mix", "local"]
     }
@@ -44,6 +88,209 @@ def check_knowledge_graph_files(working_dir: str) -> Dict[str, bool]:
     }
 
 
+_GRAPHML_NS = "{http://graphml.graphdrawing.org/xmlns}"
+_GRAPHML_GRAPH_TAG = f"{_GRAPHML_NS}graph"
+_GRAPHML_NODE_TAG = f"{_GRAPHML_NS}node"
+_GRAPHML_EDGE_TAG = f"{_GRAPHML_NS}edge"
+_GRAPHML_DATA_TAG = f"{_GRAPHML_NS}data"
+
+# XML解析异常类型（lxml可用时包含其语法错误）
+_XML_PARSE_ERRORS = (
+    (ET.ParseError, _lxml_etree.XMLSyntaxError) if _lxml_etree is not None
+    else (ET.ParseError,)
+)
+
+
+def _collect_graphml_data(elem, item: Dict[str, Any]) -> Dict[str, Any]:
+    """把GraphML元素下的data子元素写入字典"""
+    for data in elem.iterfind(_GRAPHML_DATA_TAG):
+        key = data.get('key')
+        value = data.text
+        if key and value:
+            item[key] = value
+    return item
+
+
+def _dumps_graph_item(item: Dict[str, Any]) -> str:
+    """序列化单个节点/边（GraphML属性均为字符串，可直接交给orjson）"""
+    if orjson is not None:
+        return orjson.dumps(item).decode('utf-8')
+    return json.dumps(item, ensure_ascii=False)
+
+
+def _iter_graphml_items(xml_file: str, tags: Tuple[str, ...] = (_GRAPHML_NODE_TAG, _GRAPHML_EDGE_TAG)):
+    """逐个产出已解析完成的GraphML节点/边元素，处理后立即释放
+
+    优先使用lxml的C解析器，不可用时回退到标准库ElementTree。
+    只需要一种标签时另一种元素也必须解析并释放，否则会一直留在树中，内存随文件增长。
+    """
+    if _lxml_etree is not None:
+        for _, elem in _lxml_etree.iterparse(
+            xml_file,
+            events=("end",),
+            tag=(_GRAPHML_NODE_TAG, _GRAPHML_EDGE_TAG),
+            huge_tree=True
+        ):
+            if elem.tag in tags:
+                yield elem
+            elem.clear(keep_tail=False)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+
+    graph = None
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            if graph is None and elem.tag == _GRAPHML_GRAPH_TAG:
+                graph = elem
+            continue
+        if elem.tag in tags:
+            yield elem
+        if elem.tag == _GRAPHML_NODE_TAG or elem.tag == _GRAPHML_EDGE_TAG:
+            elem.clear()
+            if graph is not None:
+                graph.clear()
+
+
+def _graphml_item(elem) -> Dict[str, Any]:
+    """把GraphML节点/边元素转换为字典"""
+    if elem.tag == _GRAPHML_NODE_TAG:
+        return _collect_graphml_data(elem, {'id': elem.get('id')})
+    return _collect_graphml_data(elem, {
+        'source': elem.get('source'),
+        'target': elem.get('target')
+    })
+
+
+def _write_graph_item(out, item: Dict[str, Any], index: int) -> None:
+    """以JSON数组元素的形式写出一个节点/边"""
+    out.write(',\n    ' if index else '\n    ')
+    out.write(_dumps_graph_item(item))
+
+
+def _dump_graphml_items(xml_file: str, tag: str, out_path: str) -> int:
+    """只提取一种标签（节点或边）并写出为JSON数组元素，供子进程调用
+
+    Returns:
+        写出的元素数量
+    """
+    count = 0
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for elem in _iter_graphml_items(xml_file, (tag,)):
+            _write_graph_item(out, _graphml_item(elem), count)
+            count += 1
+    return count
+
+
+_GRAPH_JSON_HEAD = '{\n  "nodes": ['
+
+
+def _write_graph_json_tail(out, xml_file: str, node_count: int, edges_src, edge_count: int) -> None:
+    """在已写出的节点数组之后拼接边数组和元数据，完成图谱JSON"""
+    out.write('\n  ],\n  "edges": [' if node_count else '],\n  "edges": [')
+    shutil.copyfileobj(edges_src, out)
+    out.write('\n  ],\n' if edge_count else '],\n')
+
+    metadata = {
+        'node_count': node_count,
+        'edge_count': edge_count,
+        'created_at': datetime.now().isoformat(),
+        'source_file': xml_file
+    }
+    out.write('  "metadata": ')
+    out.write(json.dumps(metadata, ensure_ascii=False))
+    out.write('\n}\n')
+
+
+def _stream_graphml_to_json(xml_file: str, json_file: str) -> Tuple[int, int]:
+    """以iterparse流式解析GraphML，并逐条写出节点和边的JSON
+
+    节点直接写入目标文件；边先写入临时文件，待节点数组结束后再拼接，
+    因此即使GraphML中节点与边交错出现，也只需常量内存。
+
+    Returns:
+        (节点数, 边数)
+    """
+    node_count = 0
+    edge_count = 0
+
+    with open(json_file, 'w', encoding='utf-8') as out, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as edges_out:
+        out.write(_GRAPH_JSON_HEAD)
+
+        for elem in _iter_graphml_items(xml_file):
+            if elem.tag == _GRAPHML_NODE_TAG:
+                _write_graph_item(out, _graphml_item(elem), node_count)
+                node_count += 1
+            else:
+                _write_graph_item(edges_out, _graphml_item(elem), edge_count)
+                edge_count += 1
+
+        edges_out.seek(0)
+        _write_graph_json_tail(out, xml_file, node_count, edges_out, edge_count)
+
+    return node_count, edge_count
+
+
+def _stream_graphml_to_json_parallel(xml_file: str, json_file: str) -> Tuple[int, int]:
+    """在两个子进程中分别提取节点和边，再拼接为JSON（适用于大型GraphML）
+
+    Returns:
+        (节点数, 边数)
+    """
+    work_dir = os.path.dirname(json_file) or "."
+    nodes_fd, nodes_path = tempfile.mkstemp(suffix=".nodes", dir=work_dir)
+    edges_fd, edges_path = tempfile.mkstemp(suffix=".edges", dir=work_dir)
+    os.close(nodes_fd)
+    os.close(edges_fd)
+
+    try:
+        # 调用方进程已运行事件循环和线程池，fork可能复制被持有的锁而死锁，改用spawn启动子进程
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            nodes_future = executor.submit(_dump_graphml_items, xml_file, _GRAPHML_NODE_TAG, nodes_path)
+            edges_future = executor.submit(_dump_graphml_items, xml_file, _GRAPHML_EDGE_TAG, edges_path)
+            node_count = nodes_future.result()
+            edge_count = edges_future.result()
+
+        with open(nodes_path, 'r', encoding='utf-8') as nodes_src, \
+                open(edges_path, 'r', encoding='utf-8') as edges_src, \
+                open(json_file, 'w', encoding='utf-8') as out:
+            out.write(_GRAPH_JSON_HEAD)
+            shutil.copyfileobj(nodes_src, out)
+            _write_graph_json_tail(out, xml_file, node_count, edges_src, edge_count)
+    finally:
+        for path in (nodes_path, edges_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return node_count, edge_count
+
+
+def _xml_fingerprint(path: str) -> str:
+    """基于文件大小和纳秒级修改时间的轻量指纹"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _read_fingerprint_file(fp_file: str) -> Dict[str, Any]:
+    """读取GraphML指纹文件，不存在或损坏时返回空字典"""
+    try:
+        with open(fp_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_fingerprint_file(fp_file: str, fingerprint: str, content_hash: Optional[str] = None) -> None:
+    """写入GraphML指纹文件"""
+    try:
+        with open(fp_file, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, "content_hash": content_hash}, f)
+    except OSError as e:
+        logger.warning(f"写入指纹文件失败: {fp_file}, 错误: {str(e)}")
+
+
 def create_or_update_knowledge_graph_json(working_dir: str) -> bool:
     """创建或更新知识图谱JSON文件"""
     try:
@@ -54,73 +301,44 @@ def create_or_update_knowledge_graph_json(working_dir: str) -> bool:
             logger.warning(f"XML文件不存在: {xml_file}")
             return False
         
-        # 检查JSON文件是否需要更新
+        # 检查JSON文件是否需要更新：先比较文件指纹（大小+修改时间），
+        # 指纹变化但开启内容校验时再比较内容哈希，内容未变则跳过转换
+        fp_file = f"{json_file}.fp"
+        fingerprint = _xml_fingerprint(xml_file)
+        content_hash = None
         if os.path.exists(json_file):
-            xml_mtime = os.path.getmtime(xml_file)
-            json_mtime = os.path.getmtime(json_file)
-            if json_mtime >= xml_mtime:
+            stored = _read_fingerprint_file(fp_file)
+            if stored.get("fingerprint") == fingerprint:
                 logger.info("JSON文件已是最新，无需更新")
                 return True
+            if settings.kg_verify_content and stored.get("content_hash"):
+                content_hash = calculate_file_hash(xml_file)
+                if content_hash and content_hash == stored["content_hash"]:
+                    _write_fingerprint_file(fp_file, fingerprint, content_hash)
+                    logger.info("XML内容未变化，JSON文件无需更新")
+                    return True
         
-        # 解析XML并转换为JSON
+        # 流式解析XML并直接写出JSON，内存中只保留当前节点/边
+        tmp_file = f"{json_file}.tmp"
         try:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            
-            # 提取节点和边信息
-            nodes = []
-            edges = []
+            if os.path.getsize(xml_file) > settings.kg_parallel_threshold:
+                node_count, edge_count = _stream_graphml_to_json_parallel(xml_file, tmp_file)
+            else:
+                node_count, edge_count = _stream_graphml_to_json(xml_file, tmp_file)
+            os.replace(tmp_file, json_file)
+            if settings.kg_verify_content and content_hash is None:
+                content_hash = calculate_file_hash(xml_file)
+            _write_fingerprint_file(fp_file, fingerprint, content_hash)
             
-            # 解析GraphML格式
-            ns = {'graphml': 'http://graphml.graphdrawing.org/xmlns'}
-            
-            for node in root.findall('.//graphml:node', ns):
-                node_id = node.get('id')
-                node_data = {'id': node_id}
-                
-                for data in node.findall('graphml:data', ns):
-                    key = data.get('key')
-                    value = data.text
-                    if key and value:
-                        node_data[key] = value
-                
-                nodes.append(node_data)
-            
-            for edge in root.findall('.//graphml:edge', ns):
-                edge_data = {
-                    'source': edge.get('source'),
-                    'target': edge.get('target')
-                }
-                
-                for data in edge.findall('graphml:data', ns):
-                    key = data.get('key')
-                    value = data.text
-                    if key and value:
-                        edge_data[key] = value
-                
-                edges.append(edge_data)
-            
-            # 保存为JSON
-            graph_data = {
-                'nodes': nodes,
-                'edges': edges,
-                'metadata': {
-                    'node_count': len(nodes),
-                    'edge_count': len(edges),
-                    'created_at': datetime.now().isoformat(),
-                    'source_file': xml_file
-                }
-            }
-            
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(graph_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"成功创建/更新JSON文件: {json_file}")
+            logger.info(f"成功创建/更新JSON文件: {json_file} (节点: {node_count}, 边: {edge_count})")
             return True
             
-        except ET.ParseError as e:
+        except _XML_PARSE_ERRORS as e:
             logger.error(f"XML解析失败: {str(e)}")
             return False
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
         
     except Exception as e:
         logger.error(f"创建/更新JSON文件失败: {str(e)}")
@@ -132,13 +350,10 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
+    # 每个单位相差2^10，直接由二进制位数得到单位下标
+    i = min(len(_SIZE_UNITS) - 1, (int(size_bytes).bit_length() - 1) // 10) if size_bytes >= 1024 else 0
     
-    return f"{size_bytes:.1f}{size_names[i]}"
+    return f"{size_bytes / (1 << (10 * i)):.1f}{_SIZE_UNITS[i]}"
 
 
 def format_duration(seconds: float) -> str:
@@ -155,19 +370,20 @@ def format_duration(seconds: float) -> str:
 
 def generate_unique_id() -> str:
     """生成唯一ID"""
-    import uuid
     return str(uuid.uuid4())
 
 
 def generate_track_id(prefix: str = "track") -> str:
     """生成跟踪ID"""
     timestamp = int(time.time() * 1000)  # 毫秒时间戳
-    return f"{prefix}_{timestamp}_{generate_unique_id()[:8]}"
+    return f"{prefix}_{timestamp}_{secrets.token_hex(4)}"
 
 
 def safe_json_loads(json_str: str, default=None) -> Any:
     """安全的JSON解析"""
     try:
+        if orjson is not None:
+            return orjson.loads(json_str)
         return json.loads(json_str)
     except (json.JSONDecodeError, TypeError):
         return default
@@ -175,6 +391,12 @@ def safe_json_loads(json_str: str, default=None) -> Any:
 
 def safe_json_dumps(obj: Any, default=None) -> str:
     """安全的JSON序列化"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            # orjson不支持的类型（如超出64位的整数）交给标准库处理
+            pass
     try:
         return json.dumps(obj, ensure_ascii=False, indent=2)
     except (TypeError, ValueError):
@@ -190,52 +412,54 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
 
 def clean_text(text: str) -> str:
     """清理文本内容"""
-    import re
-    
     # 移除多余的空白字符
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS_RE.sub(' ', text)
     
     # 移除特殊字符（保留基本标点）
-    text = re.sub(r'[^\w\s\u4e00-\u9fff.,!?;:()[\]{}"\'-]', '', text)
+    text = _CLEAN_RE.sub('', text)
     
     return text.strip()
 
 
 def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     """提取关键词（简单实现）"""
-    import re
-    from collections import Counter
-    
-    # 简单的关键词提取
-    words = re.findall(r'\b\w+\b', text.lower())
-    
-    # 过滤停用词（简化版）
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-        '的', '了', '在', '是', '我', '你', '他', '她', '它', '们', '这', '那', '有', '没', '不', '也', '都', '很', '就', '还'
-    }
-    
-    words = [word for word in words if word not in stop_words and len(word) > 2]
-    
-    # 统计词频
-    word_counts = Counter(words)
+    # 单次扫描完成分词、停用词过滤（简化版）和词频统计
+    word_counts = Counter()
+    for match in _WORD_RE.finditer(text.lower()):
+        word = match.group()
+        if len(word) > 2 and word not in _STOP_WORDS:
+            word_counts[word] += 1
     
     # 返回最常见的关键词
     return [word for word, count in word_counts.most_common(max_keywords)]
 
 
-async def retry_async(func, max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
-    """异步重试装饰器"""
-    for attempt in range(max_retries):
-        try:
-            return await func()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise e
-            
-            wait_time = delay * (backoff ** attempt)
-            logger.warning(f"操作失败，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-            await asyncio.sleep(wait_time)
+def retry_async(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
+    """异步重试装饰器
+
+    用法::
+
+        @retry_async(max_retries=3)
+        async def fetch(...):
+            ...
+    """
+    # 退避时间表在装饰时一次性计算
+    wait_times = tuple(delay * (backoff ** attempt) for attempt in range(max_retries))
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt, wait_time in enumerate(wait_times):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == max_retries - 1:
+                        raise
+                    
+                    logger.warning(f"操作失败，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(wait_time)
+        return wrapper
+    return decorator
 
 
 def measure_time(func):
@@ -264,24 +488,22 @@ async def measure_time_async(func):
 
 def get_system_info() -> Dict[str, Any]:
     """获取系统信息"""
-    import platform
-    import psutil
-    
-    try:
-        return {
-            "platform": platform.platform(),
-            "python_version": platform.python_version(),
-            "cpu_count": psutil.cpu_count(),
-            "memory_total": psutil.virtual_memory().total,
-            "memory_available": psutil.virtual_memory().available,
-            "disk_usage": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
-        }
-    except ImportError:
+    if psutil is None:
         return {
             "platform": platform.platform(),
             "python_version": platform.python_version(),
             "note": "psutil not available for detailed system info"
         }
+    
+    memory = psutil.virtual_memory()
+    return {
+        "platform": platform.platform(),
+        "python_version": platform.python_version(),
+        "cpu_count": psutil.cpu_count(),
+        "memory_total": memory.total,
+        "memory_available": memory.available,
+        "disk_usage": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
+    }
 
 
 def validate_json_schema(data: dict, required_fields: List[str]) -> bool:
@@ -297,13 +519,19 @@ def merge_dicts(*dicts) -> Dict[str, Any]:
     result = {}
     for d in dicts:
         if isinstance(d, dict):
-            result.update(d)
+            result |= d
     return result
 
 
-def chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
-    """将列表分块"""
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+def chunk_list(lst: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """将列表（或任意可迭代对象）按块惰性产出
+
+    返回生成器，调用方只遍历一次时无需预先复制全部分块；
+    需要列表时使用 list(chunk_list(...))。
+    """
+    it = iter(lst)
+    while chunk := list(islice(it, chunk_size)):
+        yield chunk
 
 
 def ensure_directory(directory: str) -> None:
@@ -312,23 +540,22 @@ def ensure_directory(directory: str) -> None:
 
 
 def calculate_file_hash(file_path: str) -> str:
-    """计算文件哈希值"""
-    import hashlib
-    hash_md5 = hashlib.md5()
+    """计算文件哈希值（blake2b，128位摘要）"""
     try:
+        hasher = hashlib.blake2b(digest_size=16)
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hasher.update(mm)
+        return hasher.hexdigest()
     except Exception:
         return ""
 
 
 def sanitize_filename(filename: str) -> str:
     """清理文件名，移除不安全字符"""
-    import re
     # 移除路径分隔符和其他不安全字符
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = _FNAME_RE.sub('_', filename)
     # 限制文件名长度
     if len(filename) > 255:
         filename = filename[:255]
@@ -27,9 +27,13 @@ from .llm_client import (
     create_llm_function,
     create_embedding_function,
     create_rerank_function,
+    bootstrap_clients,
     get_llm_client,
     get_embedding_client,
     get_rerank_client,
+    get_session,
+    close_session,
+    start_session_keepalive,
 )
 
 __all__ = [
@@ -57,7 +61,11 @@ __all__ = [
     "create_llm_function",
     "create_embedding_function",
     "create_rerank_function",
+    "bootstrap_clients",
     "get_llm_client",
     "get_embedding_client",
     "get_rerank_client",
+    "get_session",
+    "close_session",
+    "start_session_keepalive",
 ]
@@ -4,13 +4,218 @@
 import asyncio
 import json
 import logging
+import random
+import re
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urlsplit
 import aiohttp
+import numpy as np
 from common.config import settings, get_llm_config, get_embedding_config, get_rerank_config
 
+try:
+    import orjson
+except ImportError:  # orjson不可用时使用标准库json
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson不可用时整体读取后再解析
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# embedding批量超过该条数或响应体超过该字节数时改为流式解析
+_STREAM_EMBEDDING_MIN_TEXTS = 256
+_STREAM_EMBEDDING_MIN_BYTES = 4 * 1024 * 1024
+
+# 模型回复中包裹JSON的代码块标记
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+# Ollama提示词中各角色的前缀
+_ROLE_PREFIX = {"system": "System: ", "user": "User: ", "assistant": "Assistant: "}
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """序列化请求体"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data: Any) -> Any:
+    """解析响应体（embedding响应包含大量浮点数，优先使用orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _parse_json_content(content: str) -> Any:
+    """解析模型回复中的JSON，兼容代码块包裹和前后多余文本"""
+    cleaned = _FENCE_RE.sub('', content)
+    try:
+        return _json_loads(cleaned)
+    except json.JSONDecodeError:
+        # 退而截取第一个 { 到最后一个 } 之间的内容
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end <= start:
+            raise
+        return _json_loads(content[start:end + 1])
+
+
+# 全局共享的HTTP会话，复用连接池中的keep-alive连接
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_keepalive_task: Optional[asyncio.Task] = None
+
+# 空闲保活探测间隔（秒），需小于连接的keepalive_timeout
+_KEEPALIVE_INTERVAL = 60
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """获取共享的aiohttp会话（按事件循环惰性创建）"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=256,
+                limit_per_host=64,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+                use_dns_cache=True,
+                ttl_dns_cache=300,
+                force_close=False
+            )
+        )
+        _session_loop = loop
+    return _session
+
+
+async def _keepalive_loop(api_bases: List[str]):
+    """定期向各API地址发送HEAD请求，避免突发流量间隙中连接被空闲回收"""
+    timeout = aiohttp.ClientTimeout(total=5)
+    while True:
+        await asyncio.sleep(_KEEPALIVE_INTERVAL)
+        session = await get_session()
+        for api_base in api_bases:
+            try:
+                async with session.head(api_base, timeout=timeout):
+                    pass
+            except Exception as e:
+                logger.debug(f"连接保活请求失败: {api_base}, {e}")
+
+
+def start_session_keepalive(api_bases: Optional[List[str]] = None):
+    """启动连接保活任务，默认探测LLM、Embedding、Rerank的API地址"""
+    global _keepalive_task
+    if _keepalive_task is not None and not _keepalive_task.done():
+        return
+    if api_bases is None:
+        configs = (get_llm_config(), get_embedding_config(), get_rerank_config())
+        api_bases = [config["api_base"] for config in configs if config.get("api_base")]
+    api_bases = list(dict.fromkeys(base.rstrip("/") for base in api_bases))
+    if api_bases:
+        _keepalive_task = asyncio.get_running_loop().create_task(_keepalive_loop(api_bases))
+
+
+async def close_session():
+    """关闭共享的aiohttp会话，在服务关闭时调用"""
+    global _session, _session_loop, _keepalive_task
+    if _keepalive_task is not None:
+        _keepalive_task.cancel()
+        _keepalive_task = None
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+# 请求重试与熔断参数
+_MAX_POST_TRIES = 4
+_RETRY_BASE_DELAY = 0.25
+_MAX_RETRY_AFTER = 30
+_BREAKER_FAILURE_THRESHOLD = 3
+_BREAKER_OPEN_SECONDS = 10
+
+
+class _CircuitBreaker:
+    """按主机统计的简易熔断器：连续失败达到阈值后短时间内直接拒绝请求"""
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+
+    def allow(self, host: str) -> bool:
+        return self._open_until.get(host, 0.0) <= time.monotonic()
+
+    def record_success(self, host: str):
+        self._failures.pop(host, None)
+        self._open_until.pop(host, None)
+
+    def record_failure(self, host: str):
+        failures = self._failures.get(host, 0) + 1
+        self._failures[host] = failures
+        if failures >= self.failure_threshold:
+            self._open_until[host] = time.monotonic() + self.open_seconds
+            logger.warning(f"{host} 连续失败 {failures} 次，熔断 {self.open_seconds} 秒")
+
+
+_breaker = _CircuitBreaker(_BREAKER_FAILURE_THRESHOLD, _BREAKER_OPEN_SECONDS)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """计算重试等待时间：优先遵循Retry-After，否则指数退避加抖动"""
+    if retry_after:
+        try:
+            return min(float(retry_after), _MAX_RETRY_AFTER) + random.uniform(0, 0.5)
+        except ValueError:
+            pass
+    return (2 ** attempt) * _RETRY_BASE_DELAY + random.uniform(0, _RETRY_BASE_DELAY)
+
+
+async def _post_with_retry(session: aiohttp.ClientSession, url: str, *,
+                           max_tries: int = _MAX_POST_TRIES, **kwargs) -> aiohttp.ClientResponse:
+    """发送POST请求，对429/5xx及连接错误按退避策略重试，并在上游持续故障时熔断
+
+    返回的响应需由调用方通过 async with 释放。
+    """
+    host = urlsplit(url).netloc
+    if not _breaker.allow(host):
+        raise Exception(f"{host} 处于熔断状态，暂停请求")
+
+    for attempt in range(max_tries):
+        last_try = attempt == max_tries - 1
+        try:
+            response = await session.post(url, **kwargs)
+        except asyncio.TimeoutError:
+            # 超时不重试，避免长耗时请求被成倍放大
+            _breaker.record_failure(host)
+            raise
+        except aiohttp.ClientConnectionError:
+            _breaker.record_failure(host)
+            if last_try or not _breaker.allow(host):
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        if response.status != 429 and response.status < 500:
+            _breaker.record_success(host)
+            return response
+
+        _breaker.record_failure(host)
+        if last_try or not _breaker.allow(host):
+            return response
+        retry_after = response.headers.get("Retry-After") if response.status == 429 else None
+        response.release()
+        logger.warning(f"{url} 返回 {response.status}，第 {attempt + 1} 次重试")
+        await asyncio.sleep(_retry_delay(attempt, retry_after))
+
 
 class BaseLLMClient(ABC):
     """LLM客户端基类"""
@@ -18,6 +223,7 @@ class BaseLLMClient(ABC):
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.timeout = config.get("timeout", 30)
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout)
 
     @abstractmethod
     async def chat_completion(self, messages: list, **kwargs) -> str:
@@ -36,6 +242,7 @@ class BaseEmbeddingClient(ABC):
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.timeout = config.get("timeout", 30)
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout)
 
     @abstractmethod
     async def create_embeddings(self, texts: List[str], **kwargs) -> List[List[float]]:
@@ -54,6 +261,7 @@ class BaseRerankClient(ABC):
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.timeout = config.get("timeout", 30)
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout)
         self.top_k = config.get("top_k", 10)
 
     @abstractmethod
@@ -91,6 +299,10 @@ class OpenAIClient(BaseLLMClient):
         super().__init__(config)
         self.api_base = config.get("api_base", "").rstrip("/")
         self.api_key = config.get("api_key", "")
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         self.model = config.get("model", "gpt-3.5-turbo")
         self.temperature = config.get("temperature", 0.1)
         self.max_tokens = config.get("max_tokens", 2048)
@@ -98,10 +310,6 @@ class OpenAIClient(BaseLLMClient):
     async def chat_completion(self, messages: list, **kwargs) -> str:
         """OpenAI聊天完成"""
         url = f"{self.api_base}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
         
         payload = {
             "model": self.model,
@@ -112,15 +320,15 @@ class OpenAIClient(BaseLLMClient):
         }
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI API错误: {response.status} - {error_text}")
-                        raise Exception(f"OpenAI API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=self._headers, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    return result["choices"][0]["message"]["content"]
+                else:
+                    error_text = await response.text()
+                    logger.error(f"OpenAI API错误: {response.status} - {error_text}")
+                    raise Exception(f"OpenAI API错误: {response.status}")
         except Exception as e:
             logger.error(f"OpenAI请求失败: {e}")
             raise
@@ -143,17 +351,16 @@ class OpenAIEmbeddingClient(BaseEmbeddingClient):
         super().__init__(config)
         self.api_base = config.get("api_base", "").rstrip("/")
         self.api_key = config.get("api_key", "")
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         self.model = config.get("model", "text-embedding-ada-002")
         self.embedding_dim = config.get("dim", 2560)
 
     async def create_embeddings(self, texts: List[str], **kwargs) -> List[List[float]]:
         """创建OpenAI文本嵌入向量"""
         url = f"{self.api_base}/embeddings"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
         payload = {
             "model": self.model,
             "input": texts,
@@ -161,19 +368,50 @@ class OpenAIEmbeddingClient(BaseEmbeddingClient):
         }
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return [item["embedding"] for item in result["data"]]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI Embedding API错误: {response.status} - {error_text}")
-                        raise Exception(f"OpenAI Embedding API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=self._headers, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    if self._should_stream(texts, response):
+                        return await self._stream_embeddings(response, len(texts))
+                    result = _json_loads(await response.read())
+                    embeddings = [item["embedding"] for item in result["data"]]
+                    if len(embeddings) != len(texts):
+                        raise Exception(f"OpenAI Embedding API返回的向量数量不匹配: {len(embeddings)}/{len(texts)}")
+                    return embeddings
+                else:
+                    error_text = await response.text()
+                    logger.error(f"OpenAI Embedding API错误: {response.status} - {error_text}")
+                    raise Exception(f"OpenAI Embedding API错误: {response.status}")
         except Exception as e:
             logger.error(f"OpenAI Embedding请求失败: {e}")
             raise
 
+    @staticmethod
+    def _should_stream(texts: List[str], response: aiohttp.ClientResponse) -> bool:
+        """大批量或大响应体时使用流式解析"""
+        if ijson is None:
+            return False
+        if len(texts) > _STREAM_EMBEDDING_MIN_TEXTS:
+            return True
+        content_length = response.content_length
+        return content_length is not None and content_length > _STREAM_EMBEDDING_MIN_BYTES
+
+    @staticmethod
+    async def _stream_embeddings(response: aiohttp.ClientResponse, count: int) -> List[List[float]]:
+        """边接收边解析 data[*].embedding，写入预分配的矩阵，返回与非流式路径相同的列表类型"""
+        out = None
+        i = 0
+        async for embedding in ijson.items(response.content, 'data.item.embedding', use_float=True):
+            if out is None:
+                out = np.empty((count, len(embedding)), dtype=np.float32)
+            if i >= count:
+                raise Exception(f"OpenAI Embedding API返回的向量数量超过请求数量: {count}")
+            out[i] = embedding
+            i += 1
+        if i != count:
+            raise Exception(f"OpenAI Embedding API返回的向量数量不匹配: {i}/{count}")
+        return out.tolist()
+
     async def health_check(self) -> bool:
         """OpenAI Embedding健康检查"""
         try:
@@ -191,18 +429,17 @@ class OpenAIRerankClient(BaseRerankClient):
         super().__init__(config)
         self.api_base = config.get("api_base", "").rstrip("/")
         self.api_key = config.get("api_key", "")
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         self.model = config.get("model", "gpt-3.5-turbo")
 
     async def rerank(self, query: str, documents: List[str], **kwargs) -> List[Tuple[int, float]]:
         """使用OpenAI Chat API进行文档重排序"""
         url = f"{self.api_base}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
         # 构建重排序提示词
-        docs_text = "\n".join([f"{i}: {doc}" for i, doc in enumerate(documents)])
+        docs_text = "\n".join(f"{i}: {doc}" for i, doc in enumerate(documents))
         prompt = f"""请根据查询"{query}"对以下文档进行相关性排序，返回JSON格式的结果。
 
 文档列表:
@@ -224,43 +461,35 @@ class OpenAIRerankClient(BaseRerankClient):
         }
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result["choices"][0]["message"]["content"]
-
-                        # 解析JSON响应
-                        try:
-                            # 清理响应格式
-                            content_clean = content.strip()
-                            if content_clean.startswith('```json'):
-                                content_clean = content_clean[7:]
-                            if content_clean.endswith('```'):
-                                content_clean = content_clean[:-3]
-                            content_clean = content_clean.strip()
-
-                            parsed = json.loads(content_clean)
-                            rankings = parsed.get("rankings", [])
-
-                            # 转换为所需格式
-                            result_rankings = []
-                            for item in rankings:
-                                idx = item.get("index", 0)
-                                score = item.get("score", 0.0)
-                                if 0 <= idx < len(documents):
-                                    result_rankings.append((idx, score))
-
-                            return result_rankings[:self.top_k]
-
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Rerank响应解析失败: {e}, 使用默认排序")
-                            # 返回默认排序
-                            return [(i, 1.0 - i * 0.1) for i in range(min(self.top_k, len(documents)))]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"OpenAI Rerank API错误: {response.status} - {error_text}")
-                        raise Exception(f"OpenAI Rerank API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=self._headers, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    content = result["choices"][0]["message"]["content"]
+
+                    # 解析JSON响应
+                    try:
+                        parsed = _parse_json_content(content)
+                        rankings = parsed.get("rankings", [])
+
+                        # 转换为所需格式
+                        result_rankings = []
+                        for item in rankings:
+                            idx = item.get("index", 0)
+                            score = item.get("score", 0.0)
+                            if 0 <= idx < len(documents):
+                                result_rankings.append((idx, score))
+
+                        return result_rankings[:self.top_k]
+
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Rerank响应解析失败: {e}, 使用默认排序")
+                        # 返回默认排序
+                        return [(i, 1.0 - i * 0.1) for i in range(min(self.top_k, len(documents)))]
+                else:
+                    error_text = await response.text()
+                    logger.error(f"OpenAI Rerank API错误: {response.status} - {error_text}")
+                    raise Exception(f"OpenAI Rerank API错误: {response.status}")
         except Exception as e:
             logger.error(f"OpenAI Rerank请求失败: {e}")
             raise
@@ -282,6 +511,10 @@ class AzureOpenAIClient(BaseLLMClient):
         super().__init__(config)
         self.api_base = config.get("api_base", "").rstrip("/")
         self.api_key = config.get("api_key", "")
+        self._headers = {
+            "api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
         self.api_version = config.get("api_version", "2023-12-01-preview")
         self.deployment_name = config.get("deployment_name", "gpt-35-turbo")
         self.temperature = config.get("temperature", 0.1)
@@ -290,10 +523,6 @@ class AzureOpenAIClient(BaseLLMClient):
     async def chat_completion(self, messages: list, **kwargs) -> str:
         """Azure OpenAI聊天完成"""
         url = f"{self.api_base}/openai/deployments/{self.deployment_name}/chat/completions"
-        headers = {
-            "api-key": self.api_key,
-            "Content-Type": "application/json"
-        }
         
         params = {"api-version": self.api_version}
         
@@ -305,15 +534,15 @@ class AzureOpenAIClient(BaseLLMClient):
         }
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, headers=headers, params=params, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Azure OpenAI API错误: {response.status} - {error_text}")
-                        raise Exception(f"Azure OpenAI API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=self._headers, params=params, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    return result["choices"][0]["message"]["content"]
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Azure OpenAI API错误: {response.status} - {error_text}")
+                    raise Exception(f"Azure OpenAI API错误: {response.status}")
         except Exception as e:
             logger.error(f"Azure OpenAI请求失败: {e}")
             raise
@@ -355,40 +584,35 @@ class OllamaClient(BaseLLMClient):
         }
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result.get("response", "")
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ollama API错误: {response.status} - {error_text}")
-                        raise Exception(f"Ollama API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=_JSON_HEADERS, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    return result.get("response", "")
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ollama API错误: {response.status} - {error_text}")
+                    raise Exception(f"Ollama API错误: {response.status}")
         except Exception as e:
             logger.error(f"Ollama请求失败: {e}")
             raise
     
     def _messages_to_prompt(self, messages: list) -> str:
         """将消息转换为提示词"""
-        prompt_parts = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "system":
-                prompt_parts.append(f"System: {content}")
-            elif role == "user":
-                prompt_parts.append(f"User: {content}")
-            elif role == "assistant":
-                prompt_parts.append(f"Assistant: {content}")
+        prompt_parts = [
+            _ROLE_PREFIX[role] + msg.get("content", "")
+            for msg in messages
+            if (role := msg.get("role", "user")) in _ROLE_PREFIX
+        ]
         return "\n".join(prompt_parts) + "\nAssistant:"
     
     async def health_check(self) -> bool:
         """Ollama健康检查"""
         try:
             url = f"{self.api_base}/api/tags"
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url) as response:
-                    return response.status == 200
+            session = await get_session()
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return response.status == 200
         except Exception as e:
             logger.warning(f"Ollama健康检查失败: {e}")
             return False
@@ -403,20 +627,19 @@ class CustomLLMClient(BaseLLMClient):
         self.api_key = config.get("api_key", "")
         self.model = config.get("model", "")
         self.headers = config.get("headers", {})
+        # 请求头在初始化时合并一次，各请求复用
+        self._headers = {
+            "Content-Type": "application/json",
+            **self.headers
+        }
+        if self.api_key:
+            self._headers["Authorization"] = f"Bearer {self.api_key}"
         self.temperature = config.get("temperature", 0.1)
         self.max_tokens = config.get("max_tokens", 2048)
     
     async def chat_completion(self, messages: list, **kwargs) -> str:
         """自定义LLM聊天完成"""
         url = f"{self.api_base}/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            **self.headers
-        }
-        
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        
         payload = {
             "model": self.model,
             "messages": messages,
@@ -426,15 +649,15 @@ class CustomLLMClient(BaseLLMClient):
         }
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"自定义LLM API错误: {response.status} - {error_text}")
-                        raise Exception(f"自定义LLM API错误: {response.status}")
+            session = await get_session()
+            async with await _post_with_retry(session, url, headers=self._headers, data=_json_dumps(payload), timeout=self.client_timeout) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    return result["choices"][0]["message"]["content"]
+                else:
+                    error_text = await response.text()
+                    logger.error(f"自定义LLM API错误: {response.status} - {error_text}")
+                    raise Exception(f"自定义LLM API错误: {response.status}")
         except Exception as e:
             logger.error(f"自定义LLM请求失败: {e}")
             raise
@@ -525,6 +748,67 @@ class RerankClientFactory:
             return None
 
 
+def _normalize_vector(embedding: List[float]) -> np.ndarray:
+    """将向量归一化为单位长度"""
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class SemanticLLMCache:
+    """LLM语义缓存
+
+    以提示词向量为键，相似度超过阈值且未过期时直接返回历史回答。
+    容量满后按写入顺序循环覆盖最旧的条目。
+    """
+
+    def __init__(self, capacity: int, threshold: float, ttl: float):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.keys: Optional[np.ndarray] = None
+        self.values: List[str] = []
+        self.expires: List[float] = []
+        self._size = 0
+        self._next = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, query: np.ndarray) -> Optional[str]:
+        """查找与query最相似的未过期回答"""
+        async with self._lock:
+            if not self._size:
+                return None
+            sims = self.keys[:self._size] @ query
+            i = int(sims.argmax())
+            if sims[i] > self.threshold and self.expires[i] > time.monotonic():
+                return self.values[i]
+            return None
+
+    async def put(self, query: np.ndarray, value: str):
+        """写入缓存"""
+        async with self._lock:
+            expires = time.monotonic() + self.ttl
+            if self._size >= self.capacity:
+                # 已满，覆盖最旧的条目
+                slot = self._next
+                self._next = (self._next + 1) % self.capacity
+                self.keys[slot] = query
+                self.values[slot] = value
+                self.expires[slot] = expires
+                return
+            if self.keys is None:
+                self.keys = np.empty((min(self.capacity, 64), query.shape[0]), dtype=np.float32)
+            elif self._size == self.keys.shape[0]:
+                # 容量倍增扩展
+                grown = np.empty((min(self.capacity, self._size * 2), self.keys.shape[1]), dtype=np.float32)
+                grown[:self._size] = self.keys
+                self.keys = grown
+            self.keys[self._size] = query
+            self.values.append(value)
+            self.expires.append(expires)
+            self._size += 1
+
+
 async def create_llm_function(**kwargs) -> Optional[callable]:
     """创建LLM函数"""
     client = LLMClientFactory.create_client()
@@ -545,7 +829,38 @@ async def create_llm_function(**kwargs) -> Optional[callable]:
         messages = [{"role": "user", "content": prompt}]
         return await client.chat_completion(messages, **kwargs)
 
-    return llm_function
+    if not settings.llm_semantic_cache:
+        return llm_function
+
+    embedding_client = EmbeddingClientFactory.create_client()
+    if not embedding_client:
+        return llm_function
+
+    semantic_cache = SemanticLLMCache(
+        capacity=settings.llm_semantic_cache_size,
+        threshold=settings.llm_semantic_cache_threshold,
+        ttl=settings.cache_ttl
+    )
+
+    async def cached_llm_function(prompt: str) -> str:
+        """带语义缓存的LLM函数包装器"""
+        try:
+            embedding = await embedding_client.create_embeddings([prompt])
+            query = _normalize_vector(embedding[0])
+        except Exception as e:
+            # 向量化失败时直接调用LLM，不影响主流程
+            logger.warning(f"语义缓存向量化失败: {e}")
+            return await llm_function(prompt)
+
+        cached = await semantic_cache.get(query)
+        if cached is not None:
+            return cached
+
+        result = await llm_function(prompt)
+        await semantic_cache.put(query, result)
+        return result
+
+    return cached_llm_function
 
 
 async def create_embedding_function() -> Optional[callable]:
@@ -595,6 +910,27 @@ async def create_rerank_function() -> Optional[callable]:
     return rerank_function
 
 
+async def bootstrap_clients() -> Tuple[Optional[callable], Optional[callable], Optional[callable]]:
+    """并发创建LLM、Embedding、Rerank函数
+
+    三个客户端的健康检查同时进行，启动耗时取决于最慢的一次请求。
+    创建失败的函数返回None。
+    """
+    results = await asyncio.gather(
+        create_llm_function(),
+        create_embedding_function(),
+        create_rerank_function(),
+        return_exceptions=True
+    )
+    functions = []
+    for name, result in zip(("LLM", "Embedding", "Rerank"), results):
+        if isinstance(result, Exception):
+            logger.warning(f"{name}函数创建失败: {result}")
+            result = None
+        functions.append(result)
+    return tuple(functions)
+
+
 # 便捷的客户端获取函数
 async def get_llm_client() -> Optional[BaseLLMClient]:
     """获取LLM客户端实例"""
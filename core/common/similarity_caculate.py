@@ -1,14 +1,47 @@
+import asyncio
+import hashlib
+import math
+import random
+from collections import OrderedDict
 from core.common.llm_client import create_embedding_function
-from typing import Callable, Optional, List
+from typing import Callable, Optional, List, Tuple, Set
 import numpy as np
 from functools import lru_cache
 
+# 合并并发单条embedding请求的等待窗口（毫秒）
+BATCH_WINDOW_MS = 5
+# 单次合并请求的最大文本数，达到后立即发送
+MAX_BATCH = 64
+# 批量相似度计算时每个子批次的文本数
+BATCH_SIZE = 64
+# 同时在途的子批次请求上限
+MAX_INFLIGHT = 4
+# 向量缓存容量（LRU淘汰）
+EMBEDDING_CACHE_SIZE = 10_000
+
+# 缓存未命中哨兵
+_MISS = object()
+
+
+def _cache_key(text: str) -> bytes:
+    """文本的定长内容哈希，作为缓存键"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
 class SimilarityCalculator:
     """相似度计算器"""
     
     def __init__(self):
         self.embedding_func = None
-        self._embedding_cache = {}
+        # 以内容哈希为键的有界LRU缓存，值为向量在 _mat 中的行号
+        self._embedding_cache: "OrderedDict[bytes, int]" = OrderedDict()
+        # 所有缓存向量按行连续存放，int8对称量化，每行一个缩放系数
+        self._mat = np.empty((0, 0), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+        # 待合并发送的 (文本, Future) 队列
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
         
     async def _ensure_embedding_func(self):
         """确保embedding函数已初始化"""
@@ -17,47 +50,210 @@ class SimilarityCalculator:
     
     async def get_vector_embedding(self, text: str) -> np.ndarray:
         """获取文本的向量嵌入"""
+        # 空文本直接返回零向量，不发起请求
+        if not text or not text.strip():
+            await self._ensure_embedding_func()
+            return np.zeros(self._embedding_dim(), dtype=np.float32)
+        
         # 缓存检查
-        if text in self._embedding_cache:
-            return self._embedding_cache[text]
+        key = _cache_key(text)
+        row = self._embedding_cache.get(key, _MISS)
+        if row is not _MISS:
+            self._embedding_cache.move_to_end(key)
+            return self._dequantize(row)
             
         await self._ensure_embedding_func()
-        embedding = await self.embedding_func([text])
         
-        result = np.array(embedding[0], dtype=np.float32)
-        # 归一化向量
-        result = result / np.linalg.norm(result)
+        # 等待期间其他协程可能已写入缓存，再检查一次
+        row = self._embedding_cache.get(key, _MISS)
+        if row is not _MISS:
+            return self._dequantize(row)
         
-        # 缓存结果
-        self._embedding_cache[text] = result
+        # 加入合并队列，由 _flush 统一发送一次批量请求
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= MAX_BATCH:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(BATCH_WINDOW_MS / 1000, self._start_flush)
+        return await fut
+    
+    def _embedding_dim(self) -> int:
+        """当前向量维度（优先取已缓存向量的维度）"""
+        if self._mat.shape[0]:
+            return self._mat.shape[1]
+        return getattr(self.embedding_func, 'embedding_dim', 2560)
+    
+    def _start_flush(self):
+        """取出当前待发送队列并启动批量请求任务"""
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        """一次请求获取整批文本的向量，并按顺序回填各个Future"""
+        try:
+            embeddings = await self.embedding_func([text for text, _ in batch])
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Embedding返回数量不符: 期望 {len(batch)}，实际 {len(embeddings)}")
+            
+            for (text, fut), embedding in zip(batch, embeddings):
+                result = np.array(embedding, dtype=np.float32)
+                # 原地归一化向量
+                norm2 = float(result @ result)
+                if norm2 > 0:
+                    result *= np.float32(1.0 / math.sqrt(norm2))
+                
+                # 缓存结果
+                self._cache_embedding(text, result)
+                if not fut.done():
+                    fut.set_result(result)
+        except asyncio.CancelledError:
+            # 批次任务被取消时一并取消等待中的调用方
+            for _, fut in batch:
+                if not fut.done():
+                    fut.cancel()
+            raise
+        except Exception as e:
+            # 请求失败或回填中途出错时将异常传递给该批次尚未完成的调用方
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            # 兜底：任何未回填的Future都不能让调用方永久等待
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("Embedding批次处理中断"))
+    
+    def _cache_embedding(self, text: str, embedding: np.ndarray):
+        """写入缓存，超出容量时淘汰最久未使用的条目并复用其所在行"""
+        key = _cache_key(text)
+        row = self._embedding_cache.get(key, _MISS)
+        if row is _MISS:
+            if len(self._embedding_cache) >= EMBEDDING_CACHE_SIZE:
+                _, row = self._embedding_cache.popitem(last=False)
+            else:
+                row = len(self._embedding_cache)
+                self._reserve_rows(row + 1, embedding.shape[0])
+            self._embedding_cache[key] = row
+        else:
+            self._embedding_cache.move_to_end(key)
+        # 对称量化：按该向量的最大绝对值映射到[-127, 127]
+        peak = float(np.abs(embedding).max()) if embedding.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        np.rint(embedding / scale, out=self._mat[row], casting='unsafe')
+        self._scales[row] = scale
+    
+    def _dequantize(self, row: int) -> np.ndarray:
+        """将缓存行还原为float32向量（新数组，不受后续行复用影响）"""
+        result = self._mat[row].astype(np.float32)
+        result *= self._scales[row]
         return result
     
+    def _reserve_rows(self, rows: int, dim: int):
+        """确保向量矩阵至少有rows行，不足时容量倍增"""
+        capacity = self._mat.shape[0]
+        if capacity >= rows:
+            return
+        new_capacity = min(EMBEDDING_CACHE_SIZE, max(1024, capacity * 2))
+        grown = np.empty((new_capacity, dim), dtype=np.int8)
+        scales = np.empty(new_capacity, dtype=np.float32)
+        if capacity:
+            grown[:capacity] = self._mat
+            scales[:capacity] = self._scales
+        self._mat = grown
+        self._scales = scales
+    
     async def calculate_similarity(self, text_a: str, text_b: str) -> float:
         """计算两个文本的余弦相似度"""
+        # 两者均已缓存时直接在缓存矩阵的行上计算
+        key_a, key_b = _cache_key(text_a), _cache_key(text_b)
+        row_a = self._embedding_cache.get(key_a, _MISS)
+        row_b = self._embedding_cache.get(key_b, _MISS)
+        if row_a is not _MISS and row_b is not _MISS:
+            self._embedding_cache.move_to_end(key_a)
+            self._embedding_cache.move_to_end(key_b)
+            # int8向量以int32累加点积，再乘回两行的缩放系数
+            dot = int(self._mat[row_a].astype(np.int32) @ self._mat[row_b].astype(np.int32))
+            score = dot * float(self._scales[row_a]) * float(self._scales[row_b])
+            return max(0.0, min(1.0, score))
+        
         embedding_a = await self.get_vector_embedding(text_a)
         embedding_b = await self.get_vector_embedding(text_b)
         
         # 由于向量已归一化，直接点积即为余弦相似度
-        score = np.dot(embedding_a, embedding_b)
-        return float(np.clip(score, 0, 1))
+        score = float(np.dot(embedding_a, embedding_b))
+        # 单个标量直接用Python比较裁剪，无需走numpy分派
+        return max(0.0, min(1.0, score))
     
     async def batch_calculate_similarity(self, texts: List[str], reference_text: str) -> List[float]:
         """批量计算相似度，提高效率"""
+        if not texts:
+            return []
+        
+        # 空文本相似度记为0，只对非空文本发起请求
+        if not reference_text or not reference_text.strip():
+            return [0.0] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return [0.0] * len(texts)
+        if len(indices) < len(texts):
+            scores = await self.batch_calculate_similarity([texts[i] for i in indices], reference_text)
+            result = [0.0] * len(texts)
+            for i, score in zip(indices, scores):
+                result[i] = score
+            return result
+        
         await self._ensure_embedding_func()
         
-        # 批量获取embeddings
-        all_texts = texts + [reference_text]
-        embeddings = await self.embedding_func(all_texts)
+        # 参考文本已缓存时无需重复向量化
+        ref_row = self._embedding_cache.get(_cache_key(reference_text), _MISS)
+        if ref_row is not _MISS:
+            reference_embedding = self._dequantize(ref_row)
+            all_texts = texts
+        else:
+            reference_embedding = None
+            all_texts = texts + [reference_text]
+        
+        # 按子批次并发获取embeddings，避免单次请求超出服务端批量上限
+        sem = asyncio.Semaphore(MAX_INFLIGHT)
+        
+        async def _embed(batch: List[str]) -> List[List[float]]:
+            async with sem:
+                # 少量随机抖动，避免同时打满服务端触发限流
+                await asyncio.sleep(random.uniform(0, 0.01))
+                return await self.embedding_func(batch)
+        
+        results = await asyncio.gather(*(
+            _embed(all_texts[i:i + BATCH_SIZE])
+            for i in range(0, len(all_texts), BATCH_SIZE)
+        ))
+        embeddings = [embedding for batch in results for embedding in batch]
+        
+        # 原地归一化所有向量，避免产生额外的临时矩阵
+        mat = np.asarray(embeddings, dtype=np.float32)
+        norms = np.sqrt(np.einsum('ij,ij->i', mat, mat))
+        np.divide(1.0, norms, out=norms, where=norms > 0)
+        mat *= norms[:, None]
         
-        # 归一化所有向量
-        embeddings = np.array(embeddings, dtype=np.float32)
-        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        if reference_embedding is None:
+            reference_embedding = mat[-1]
+            mat = mat[:-1]
+            # 缓存参考文本向量，供后续以同一参考文本调用时复用
+            self._cache_embedding(reference_text, reference_embedding)
         
-        # 计算相似度
-        reference_embedding = embeddings[-1]
-        similarities = np.dot(embeddings[:-1], reference_embedding)
+        # 计算相似度（矩阵-向量乘法走BLAS）
+        similarities = mat @ reference_embedding
+        np.clip(similarities, 0, 1, out=similarities)
         
-        return [float(np.clip(sim, 0, 1)) for sim in similarities]
+        return similarities.tolist()
     
     def clear_cache(self):
         """清空缓存"""
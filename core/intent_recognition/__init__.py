@@ -20,13 +20,18 @@ from .processor import (
 
 from .dfa_filter import (
     DFAFilter,
-    SensitiveWordManager
+    SensitiveWordManager,
+    get_shared_sensitive_word_manager
 )
 
 from .utils import (
     QueryUtils,
     IntentPatterns,
-    EnhancementTemplates
+    EnhancementTemplates,
+    PRECOMPILED_PATTERNS,
+    EDUCATIONAL_PATTERNS,
+    INSTRUCTIVE_PATTERNS,
+    DEFAULT_ENHANCEMENT_TEMPLATES
 )
 
 # 版本信息
@@ -51,9 +56,14 @@ __all__ = [
     # 过滤器类
     "DFAFilter",
     "SensitiveWordManager",
+    "get_shared_sensitive_word_manager",
     
     # 工具类
     "QueryUtils",
     "IntentPatterns",
-    "EnhancementTemplates"
+    "EnhancementTemplates",
+    "PRECOMPILED_PATTERNS",
+    "EDUCATIONAL_PATTERNS",
+    "INSTRUCTIVE_PATTERNS",
+    "DEFAULT_ENHANCEMENT_TEMPLATES"
 ]
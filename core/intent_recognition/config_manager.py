@@ -2,15 +2,16 @@
 意图识别配置管理器
 支持动态配置加载、热更新和配置验证
 """
-import json
 import os
+import threading
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set, Tuple
 
 from common.logging_utils import logger_manager
 from common.config import settings
 from .models import ProcessorConfig, LLMPromptConfig, IntentTypeConfig, SafetyConfig
+from .utils import load_json_file
 
 # 可选的文件监听功能
 try:
@@ -29,31 +30,66 @@ if WATCHDOG_AVAILABLE:
     class ConfigFileHandler(FileSystemEventHandler):
         """配置文件变更监听器"""
 
+        # 合并窗口（秒）：首个事件立即重载，窗口内的后续事件在窗口结束时再重载一次
+        DEBOUNCE_SECONDS = 0.5
+
         def __init__(self, config_manager):
             self.config_manager = config_manager
-            self.last_modified = {}
+            self._lock = threading.Lock()
+            self._timers: Dict[str, threading.Timer] = {}
+            self._pending: Set[str] = set()
 
         def on_modified(self, event):
             if event.is_directory:
                 return
+            self._schedule(event.src_path)
+
+        def on_moved(self, event):
+            # 原子保存（写临时文件后重命名）只产生移动事件，以目标路径为准
+            if event.is_directory:
+                return
+            self._schedule(event.dest_path)
 
-            file_path = event.src_path
+        def _schedule(self, file_path: str):
             if not file_path.endswith('.json'):
                 return
 
-            # 防止重复触发
-            current_time = time.time()
-            if file_path in self.last_modified:
-                if current_time - self.last_modified[file_path] < 1.0:  # 1秒内的重复事件忽略
+            with self._lock:
+                if file_path in self._timers:
+                    # 窗口期内的事件只做标记，由窗口结束时统一重载，保证不丢失最后一次修改
+                    self._pending.add(file_path)
                     return
+                timer = threading.Timer(self.DEBOUNCE_SECONDS, self._flush, [file_path])
+                timer.daemon = True
+                self._timers[file_path] = timer
+                timer.start()
 
-            self.last_modified[file_path] = current_time
+            self._reload(file_path)
 
+        def _flush(self, file_path: str):
+            """窗口结束：若期间有新事件则再重载一次"""
+            with self._lock:
+                self._timers.pop(file_path, None)
+                pending = file_path in self._pending
+                self._pending.discard(file_path)
+
+            if pending:
+                self._reload(file_path)
+
+        def _reload(self, file_path: str):
             try:
                 logger.info(f"检测到配置文件变更: {file_path}")
                 self.config_manager.reload_config()
             except Exception as e:
                 logger.error(f"重新加载配置失败: {e}")
+
+        def cancel(self):
+            """取消所有未触发的合并定时器"""
+            with self._lock:
+                for timer in self._timers.values():
+                    timer.cancel()
+                self._timers.clear()
+                self._pending.clear()
 else:
     class ConfigFileHandler:
         """配置文件变更监听器（占位符）"""
@@ -70,6 +106,8 @@ class IntentConfigManager:
         self.observer: Optional[Observer] = None
         self.file_handler: Optional[ConfigFileHandler] = None
         self._config_cache = {}
+        # 已解析配置缓存：路径 -> (mtime_ns, 文件大小, 配置)，文件未变化时跳过重复解析
+        self._parse_cache: Dict[str, Tuple[int, int, ProcessorConfig]] = {}
         self._last_reload_time = 0
         
         # 初始化配置
@@ -85,8 +123,16 @@ class IntentConfigManager:
         """加载配置"""
         try:
             if os.path.exists(self.config_path):
+                st = os.stat(self.config_path)
+                cached = self._parse_cache.get(self.config_path)
+                if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                    logger.debug(f"配置文件未变化，复用已解析配置: {self.config_path}")
+                    self.config = cached[2]
+                    return self.config
+                
                 logger.info(f"从文件加载配置: {self.config_path}")
                 self.config = ProcessorConfig.from_file(self.config_path)
+                self._parse_cache[self.config_path] = (st.st_mtime_ns, st.st_size, self.config)
             else:
                 logger.info("配置文件不存在，使用默认配置")
                 self.config = self._create_default_config()
@@ -140,9 +186,9 @@ class IntentConfigManager:
                 "unclear": "意图不明确",
                 "illegal_content": "非法内容"
             },
-            custom_intent_types=custom_intents.get('intent_types', {}),
-            intent_priorities=custom_intents.get('priorities', {}),
-            intent_categories=custom_intents.get('categories', {})
+            custom_intent_types=custom_intents.get('intent_types') or {},
+            intent_priorities=custom_intents.get('priorities') or {},
+            intent_categories=custom_intents.get('categories') or {}
         )
         
         # 创建安全配置
@@ -195,8 +241,7 @@ class IntentConfigManager:
             intents_file = os.path.join(intent_config_path, 'intents.json')
             
             if os.path.exists(intents_file):
-                with open(intents_file, 'r', encoding='utf-8') as f:
-                    intents_data = json.load(f)
+                intents_data = load_json_file(intents_file)
                 
                 for intent in intents_data:
                     if intent.get('is_active', True):
@@ -246,6 +291,8 @@ class IntentConfigManager:
             self.observer.stop()
             self.observer.join()
             self.observer = None
+            if hasattr(self.file_handler, "cancel"):
+                self.file_handler.cancel()
             self.file_handler = None
             logger.info("停止监听配置文件变更")
     
@@ -288,6 +335,8 @@ class IntentConfigManager:
                 for key, value in safety_updates.items():
                     if hasattr(self.config.safety_config, key):
                         setattr(self.config.safety_config, key, value)
+                # 模式列表可能已被替换，重新编译匹配器
+                self.config.safety_config.build_matcher()
             
             # 保存更新后的配置
             self.save_config()
@@ -300,13 +349,17 @@ class IntentConfigManager:
 
 # 全局配置管理器实例
 _config_manager: Optional[IntentConfigManager] = None
+_config_manager_lock = threading.Lock()
 
 
 def get_config_manager() -> IntentConfigManager:
     """获取全局配置管理器实例"""
     global _config_manager
     if _config_manager is None:
-        _config_manager = IntentConfigManager()
+        # 双重检查加锁，避免并发首次访问时创建多个实例（及多个文件监听线程）
+        with _config_manager_lock:
+            if _config_manager is None:
+                _config_manager = IntentConfigManager()
     return _config_manager
 
 
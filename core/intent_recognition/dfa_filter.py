@@ -2,13 +2,37 @@
 DFA（确定有限状态自动机）敏感词过滤器
 优化版本 - 适配项目架构和性能要求
 """
+import mmap
+import operator
+import os
 import re
-from typing import Set, List, Tuple, Dict, Any
+import sys
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Tuple, Dict, Any
 from pathlib import Path
 from common.logging_utils import logger_manager
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick不可用时使用纯Python字典树
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:  # google-re2不可用时使用标准库re
+    re2 = None
+
+try:
+    import hyperscan
+except ImportError:  # hyperscan不可用时使用标准库正则
+    hyperscan = None
+
 logger = logger_manager.get_logger("dfa_filter")
 
+# 词条来源标签：敏感词库 / 安全配置中的风险关键词，两类词条共用同一个自动机
+VOCABULARY_TAG = "vocabulary"
+RISK_KEYWORD_TAG = "risk_keyword"
+
 
 class DFAFilter:
     """DFA敏感词过滤器"""
@@ -17,8 +41,20 @@ class DFAFilter:
         self.case_sensitive = case_sensitive
         self.enable_fuzzy_match = enable_fuzzy_match
         self.root = {}
+        # 字典树节点数（含根节点），随 add_word 增量维护
+        self._node_count = 1
         self.end_flag = "END"
-        self.sensitive_words: Set[str] = set()
+        # 敏感词库词条数，词条本身只保存在自动机/字典树中
+        self._word_count = 0
+        
+        # Aho-Corasick自动机（C实现，单次扫描匹配所有敏感词）
+        self._ac = ahocorasick.Automaton() if ahocorasick is not None else None
+        # 新增词条先暂存，首次匹配前统一写入自动机/字典树并只构建一次
+        self._pending_words: List[Tuple[str, str]] = []
+        self._finalized = True
+        # 字典树回退路径的预过滤：词条的全部2-gram及单字词条，文本不含其中任何一个时必然无命中
+        self._bigrams: FrozenSet[str] = frozenset()
+        self._unigrams: FrozenSet[str] = frozenset()
         
         # 模糊匹配字符映射
         self.fuzzy_map = {
@@ -29,6 +65,8 @@ class DFAFilter:
             '六': '6', '七': '7', '八': '8', '九': '9',
             '＠': 'a', '＄': 's', '！': 'i', '｜': 'l', '＋': 't'
         }
+        # 单次扫描完成所有字符替换的转换表（各键均为单字符）
+        self._trans_table = str.maketrans(self.fuzzy_map)
     
     def load_from_file(self, file_path: str) -> int:
         """从文件加载敏感词"""
@@ -39,13 +77,21 @@ class DFAFilter:
                 return 0
             
             count = 0
-            with open(path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
+            if path.stat().st_size == 0:
+                return 0
+            
+            # 内存映射整个文件，按字节逐行切分后再解码，避免文本流的分块解码开销
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for index, raw in enumerate(iter(mm.readline, b'')):
+                    if index == 0:
+                        raw = raw.lstrip(b'\xef\xbb\xbf')  # 跳过UTF-8 BOM
+                    raw = raw.strip()
+                    if not raw or raw.startswith(b'#'):
                         continue
                     
-                    word = line if self.case_sensitive else line.lower()
+                    word = raw.decode('utf-8')
+                    if not self.case_sensitive:
+                        word = word.lower()
                     self.add_word(word)
                     count += 1
             
@@ -67,10 +113,17 @@ class DFAFilter:
             total_count = 0
             extensions = {'.txt', '.csv', '.dat'}
             
-            for file_path in path.iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in extensions:
-                    logger.debug(f"加载敏感词文件: {file_path.name}")
-                    count = self.load_from_file(str(file_path))
+            # os.scandir 的 DirEntry 缓存了文件类型，避免逐个文件额外stat
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    name = entry.name
+                    dot = name.rfind('.')
+                    if dot < 0 or name[dot:].lower() not in extensions:
+                        continue
+                    logger.debug(f"加载敏感词文件: {name}")
+                    count = self.load_from_file(entry.path)
                     total_count += count
             
             logger.info(f"从目录 {dir_path} 总共加载 {total_count} 个敏感词")
@@ -80,87 +133,227 @@ class DFAFilter:
             logger.error(f"加载敏感词目录失败: {e}")
             return 0
     
-    def add_word(self, word: str):
-        """添加敏感词到DFA树"""
+    def add_word(self, word: str, tag: str = VOCABULARY_TAG):
+        """添加词条到DFA树，tag标记词条来源（同一词条可带多个标签）"""
         if not word or not word.strip():
             return
         
         word = word.strip()
         if not self.case_sensitive:
             word = word.lower()
+        # 驻留字符串，使词表、自动机与匹配结果共享同一个对象
+        word = sys.intern(word)
+        
+        self._pending_words.append((word, tag))
+        self._finalized = False
+    
+    def _ensure_finalized(self):
+        """将暂存的词条批量写入自动机（或字典树），Aho-Corasick失败链接只构建一次"""
+        if self._finalized:
+            return
         
-        self.sensitive_words.add(word)
+        if self._ac is not None:
+            for word, tag in self._pending_words:
+                _, tags = self._ac.get(word, (word, frozenset()))
+                if tag == VOCABULARY_TAG and tag not in tags:
+                    self._word_count += 1
+                self._ac.add_word(word, (word, tags | {tag}))
+            if len(self._ac):
+                self._ac.make_automaton()
+        else:
+            # 构建DFA树，叶子节点保存该词条的标签集合
+            end_flag = self.end_flag
+            for word, tag in self._pending_words:
+                current = self.root
+                for char in word:
+                    if char not in current:
+                        current[char] = {}
+                        self._node_count += 1
+                    current = current[char]
+                tags = current.get(end_flag, frozenset())
+                if tag == VOCABULARY_TAG and tag not in tags:
+                    self._word_count += 1
+                current[end_flag] = tags | {tag}
+            
+            words = [word for word, _ in self._pending_words]
+            self._bigrams |= {word[i:i + 2] for word in words for i in range(len(word) - 1)}
+            self._unigrams |= {word for word in words if len(word) == 1}
         
-        # 构建DFA树
-        current = self.root
-        for char in word:
-            if char not in current:
-                current[char] = {}
-            current = current[char]
-        current[self.end_flag] = True
+        self._pending_words.clear()
+        self._finalized = True
     
     def add_words(self, words: List[str]):
         """批量添加敏感词"""
         for word in words:
             self.add_word(word)
     
+    @property
+    def sensitive_words(self) -> FrozenSet[str]:
+        """敏感词库中的全部词条（按需从自动机/字典树中还原）"""
+        self._ensure_finalized()
+        if self._ac is not None:
+            return frozenset(
+                word for word, tags in self._ac.values() if VOCABULARY_TAG in tags
+            )
+        
+        words = []
+        end_flag = self.end_flag
+        stack = [(self.root, "")]
+        while stack:
+            node, prefix = stack.pop()
+            for key, child in node.items():
+                if key == end_flag:
+                    if VOCABULARY_TAG in child:
+                        words.append(prefix)
+                else:
+                    stack.append((child, prefix + key))
+        return frozenset(words)
+    
     def _normalize_text(self, text: str) -> str:
         """文本标准化"""
         if not self.case_sensitive:
             text = text.lower()
         
         if self.enable_fuzzy_match:
-            for old_char, new_char in self.fuzzy_map.items():
-                text = text.replace(old_char, new_char)
+            text = text.translate(self._trans_table)
         
         return text
     
     def search(self, text: str) -> List[Tuple[int, int, str]]:
-        """搜索文本中的敏感词"""
-        if not text or not self.root:
+        """搜索文本中的敏感词（仅返回敏感词库中的词条）"""
+        return [
+            (start, end, word)
+            for start, end, word, tags in self.search_tagged(text)
+            if VOCABULARY_TAG in tags
+        ]
+    
+    def search_tagged(self, text: str) -> List[Tuple[int, int, str, FrozenSet[str]]]:
+        """一次扫描返回所有词条的命中结果及其来源标签"""
+        if not text:
+            return []
+        self._ensure_finalized()
+        if not self._has_terms():
             return []
         
         text = self._normalize_text(text)
+        
+        if self._ac is not None:
+            # 按起始位置排序，与字典树的匹配顺序保持一致
+            return sorted(
+                (end - len(word) + 1, end + 1, word, tags)
+                for end, (word, tags) in self._ac.iter(text)
+            )
+        
+        if not self._may_match(text):
+            return []
+        
+        # 纯Python字典树回退实现：热点循环中使用局部变量，单次get代替 in + 取值
         results = []
+        append = results.append
+        root = self.root
+        end_flag = self.end_flag
         text_length = len(text)
         
-        for i in range(text_length):
-            current = self.root
-            j = i
-            
-            while j < text_length and text[j] in current:
-                current = current[text[j]]
+        for i, char in enumerate(text):
+            current = root.get(char)
+            j = i + 1
+            while current is not None:
+                tags = current.get(end_flag)
+                if tags is not None:
+                    append((i, j, text[i:j], tags))
+                if j >= text_length:
+                    break
+                current = current.get(text[j])
                 j += 1
-                
-                if self.end_flag in current:
-                    matched_word = text[i:j]
-                    results.append((i, j, matched_word))
         
         return results
     
+    def _may_match(self, text: str) -> bool:
+        """基于2-gram的快速预判（逐位置切片在C层完成），为False时文本一定不含任何词条"""
+        if not self._unigrams.isdisjoint(text):
+            return True
+        return not self._bigrams.isdisjoint(map(operator.add, text, text[1:]))
+    
+    def _has_terms(self) -> bool:
+        """是否已加载任何词条"""
+        if self._ac is not None:
+            return len(self._ac) > 0
+        return bool(self.root)
+    
     def contains_sensitive(self, text: str) -> bool:
         """检查文本是否包含敏感词"""
-        return len(self.search(text)) > 0
+        return self._first_match(text, VOCABULARY_TAG)
     
-    def filter_text(self, text: str, replacement: str = "*") -> str:
-        """过滤文本中的敏感词"""
+    def _first_match(self, text: str, tag: Optional[str] = None) -> bool:
+        """命中第一个词条即返回，tag为None时任意来源的词条均计入"""
+        if not text:
+            return False
+        self._ensure_finalized()
+        if not self._has_terms():
+            return False
+        
+        text = self._normalize_text(text)
+        
+        if self._ac is not None:
+            for _, (_, tags) in self._ac.iter(text):
+                if tag is None or tag in tags:
+                    return True
+            return False
+        
+        if not self._may_match(text):
+            return False
+        
+        root = self.root
+        end_flag = self.end_flag
+        text_length = len(text)
+        
+        for i, char in enumerate(text):
+            current = root.get(char)
+            j = i + 1
+            while current is not None:
+                tags = current.get(end_flag)
+                if tags is not None and (tag is None or tag in tags):
+                    return True
+                if j >= text_length:
+                    break
+                current = current.get(text[j])
+                j += 1
+        
+        return False
+    
+    def filter_text(self, text: str, replacement: str = "*",
+                    matches: List[Tuple[int, int, str]] = None) -> str:
+        """过滤文本中的敏感词，已有search结果时可通过matches传入以免重复扫描"""
         if not text:
             return text
         
-        matches = self.search(text)
+        if matches is None:
+            matches = self.search(text)
         if not matches:
             return text
         
-        filtered_text = text
-        for start, end, word in reversed(matches):
-            replace_len = end - start
-            filtered_text = (
-                filtered_text[:start] + 
-                replacement * replace_len + 
-                filtered_text[end:]
-            )
+        # 先合并重叠区间，再按顺序拼接未命中片段与替换片段
+        segments = []
+        cursor = 0
+        for start, end in self._merge_spans(matches):
+            segments.append(text[cursor:start])
+            segments.append(replacement * (end - start))
+            cursor = end
+        segments.append(text[cursor:])
         
-        return filtered_text
+        return "".join(segments)
+    
+    @staticmethod
+    def _merge_spans(matches: List[Tuple[int, int, str]]) -> List[Tuple[int, int]]:
+        """将匹配结果合并为互不重叠的 [start, end) 区间"""
+        spans = []
+        for start, end, _ in sorted(matches):
+            if spans and start <= spans[-1][1]:
+                if end > spans[-1][1]:
+                    spans[-1] = (spans[-1][0], end)
+            else:
+                spans.append((start, end))
+        return spans
     
     def get_sensitive_words(self, text: str) -> List[str]:
         """获取文本中的敏感词列表"""
@@ -168,17 +361,18 @@ class DFAFilter:
         return [word for _, _, word in matches]
     
     def analyze_text(self, text: str) -> Dict[str, Any]:
-        """分析文本的敏感词情况"""
-        matches = self.search(text)
-        sensitive_words = [word for _, _, word in matches]
+        """分析文本的敏感词情况（不生成过滤文本，需要时以 matches 调用 filter_text）"""
+        # 一次扫描同时得到敏感词命中与风险关键词命中
+        tagged = self.search_tagged(text)
+        matches = [(start, end, word) for start, end, word, tags in tagged if VOCABULARY_TAG in tags]
         
         return {
             "has_sensitive": len(matches) > 0,
             "sensitive_count": len(matches),
-            "sensitive_words": list(set(sensitive_words)),
+            "sensitive_words": list({word for _, _, word in matches}),
             "matches": matches,
             "risk_level": self._calculate_risk_level(matches),
-            "filtered_text": self.filter_text(text)
+            "risk_keyword_hits": list({word for _, _, word, tags in tagged if RISK_KEYWORD_TAG in tags})
         }
     
     def _calculate_risk_level(self, matches: List[Tuple[int, int, str]]) -> str:
@@ -196,8 +390,9 @@ class DFAFilter:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取过滤器统计信息"""
+        self._ensure_finalized()
         return {
-            "total_words": len(self.sensitive_words),
+            "total_words": self._word_count,
             "case_sensitive": self.case_sensitive,
             "fuzzy_match": self.enable_fuzzy_match,
             "tree_nodes": self._count_tree_nodes()
@@ -205,19 +400,22 @@ class DFAFilter:
     
     def _count_tree_nodes(self) -> int:
         """计算DFA树节点数量"""
-        def count_nodes(node):
-            count = 1
-            for key, child in node.items():
-                if key != self.end_flag and isinstance(child, dict):
-                    count += count_nodes(child)
-            return count
-        
-        return count_nodes(self.root) if self.root else 0
+        self._ensure_finalized()
+        if self._ac is not None:
+            return self._ac.get_stats()["nodes_count"] if len(self._ac) else 0
+        return self._node_count if self.root else 0
     
     def clear(self):
         """清空过滤器"""
         self.root = {}
-        self.sensitive_words.clear()
+        self._node_count = 1
+        self._word_count = 0
+        self._bigrams = frozenset()
+        self._unigrams = frozenset()
+        self._pending_words.clear()
+        self._finalized = True
+        if self._ac is not None:
+            self._ac.clear()
 
 
 class SensitiveWordManager:
@@ -234,8 +432,64 @@ class SensitiveWordManager:
             "how to avoid", "how to report", "how to identify", "risk", "legal consequences"
         ]
 
-    def initialize(self, base_path: str = "core/intent_recognition/sensitive_vocabulary"):
-        """初始化敏感词过滤器"""
+        # 教育性表达
+        self.educational_expressions = [
+            "如何识别", "如何防范", "如何避免", "如何预防", "如何举报",
+            "怎样识别", "怎样防范", "怎样避免", "怎样预防", "怎样举报",
+            "怎么识别", "怎么防范", "怎么避免", "怎么预防", "怎么举报",
+            "的危害", "的风险", "的后果", "有什么危害", "有什么风险",
+            "how to avoid", "how to prevent", "how to identify", "how to report"
+        ]
+
+        # 配置时统一转小写并去重，匹配时只对输入文本做一次lower()
+        self._edu_patterns_lower = tuple(pattern.lower() for pattern in self.educational_patterns)
+        self._edu_expressions_lower = tuple(pattern.lower() for pattern in self.educational_expressions)
+        edu_literals = list(dict.fromkeys(self._edu_patterns_lower + self._edu_expressions_lower))
+        # 两组模式合并为一个正则，一次扫描完成教育导向判断（可用时使用线性时间的re2）
+        engine = re2 or re
+        self._edu_re = engine.compile("|".join(engine.escape(pattern) for pattern in edu_literals))
+        edu_patterns = [re.escape(pattern) for pattern in edu_literals]
+        # 可用时使用hyperscan将所有模式编译为一个SIMD加速的自动机
+        self._edu_db = self._compile_hyperscan(edu_patterns) if hyperscan is not None else None
+
+    @staticmethod
+    def _compile_hyperscan(patterns: List[str]):
+        """编译hyperscan模式库，失败时返回None并回退到正则"""
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[pattern.encode('utf-8') for pattern in patterns],
+                ids=list(range(len(patterns))),
+                elements=len(patterns),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(patterns)
+            )
+            return db
+        except Exception as e:
+            logger.warning(f"hyperscan模式编译失败，使用正则匹配: {e}")
+            return None
+
+    def _has_educational_intent(self, text_lower: str) -> bool:
+        """检查文本是否含教育/防范导向表达"""
+        if self._edu_db is None:
+            return self._edu_re.search(text_lower) is not None
+
+        found = False
+
+        def on_match(pattern_id, start, end, flags, context):
+            nonlocal found
+            found = True
+            # 返回True终止扫描，命中一个即可
+            return True
+
+        try:
+            self._edu_db.scan(text_lower.encode('utf-8'), match_event_handler=on_match)
+        except hyperscan.ScanTerminated:
+            pass
+        return found
+
+    def initialize(self, base_path: str = "core/intent_recognition/sensitive_vocabulary",
+                   risk_keywords: Iterable[str] = ()):
+        """初始化敏感词过滤器，risk_keywords以风险关键词标签并入同一个自动机"""
         try:
             # 创建DFA过滤器
             dfa_config = self.config.get("dfa", {})
@@ -254,6 +508,8 @@ class SensitiveWordManager:
             else:
                 logger.warning(f"敏感词路径不存在: {vocab_path}")
                 count = 0
+            for keyword in risk_keywords:
+                self.dfa_filter.add_word(keyword, tag=RISK_KEYWORD_TAG)
 
             logger.info(f"敏感词过滤器初始化完成，加载 {count} 个敏感词")
             return count > 0
@@ -274,28 +530,23 @@ class SensitiveWordManager:
                 "reason": "过滤器未初始化"
             }
 
+        # 未命中任何词条时直接判定安全，无需收集完整匹配结果
+        if not self.dfa_filter._first_match(text):
+            return {
+                "is_safe": True,
+                "safety_level": "safe",
+                "risk_factors": [],
+                "confidence": 0.9,
+                "reason": "DFA敏感词检测",
+                "sensitive_words": [],
+                "filtered_text": text
+            }
+
         # DFA分析
         analysis = self.dfa_filter.analyze_text(text)
 
         # 检查教育导向
-        text_lower = text.lower()
-        has_educational_intent = any(
-            pattern.lower() in text_lower for pattern in self.educational_patterns
-        )
-
-        # 额外检查教育性表达
-        educational_expressions = [
-            "如何识别", "如何防范", "如何避免", "如何预防", "如何举报",
-            "怎样识别", "怎样防范", "怎样避免", "怎样预防", "怎样举报",
-            "怎么识别", "怎么防范", "怎么避免", "怎么预防", "怎么举报",
-            "的危害", "的风险", "的后果", "有什么危害", "有什么风险",
-            "how to avoid", "how to prevent", "how to identify", "how to report"
-        ]
-
-        if not has_educational_intent:
-            has_educational_intent = any(
-                expr in text_lower for expr in educational_expressions
-            )
+        has_educational_intent = self._has_educational_intent(text.lower())
 
         # 判断安全级别
         if not analysis["has_sensitive"]:
@@ -322,6 +573,8 @@ class SensitiveWordManager:
         risk_factors = []
         if analysis["sensitive_words"]:
             risk_factors.append(f"检测到敏感词: {', '.join(analysis['sensitive_words'])}")
+        if analysis["risk_keyword_hits"]:
+            risk_factors.append(f"命中风险关键词: {', '.join(analysis['risk_keyword_hits'])}")
 
         return {
             "is_safe": is_safe,
@@ -330,9 +583,19 @@ class SensitiveWordManager:
             "confidence": 0.9,
             "reason": "DFA敏感词检测",
             "sensitive_words": analysis["sensitive_words"],
-            "filtered_text": analysis["filtered_text"]
+            # 仅在判定不安全时才重建过滤文本，复用已有匹配结果不再重复扫描
+            "filtered_text": text if is_safe else self.dfa_filter.filter_text(text, matches=analysis["matches"])
         }
 
 
+@lru_cache(maxsize=None)
+def get_shared_sensitive_word_manager(base_path: str = "core/intent_recognition/sensitive_vocabulary",
+                                      risk_keywords: Tuple[str, ...] = ()) -> SensitiveWordManager:
+    """获取按词库路径和风险关键词共享的敏感词管理器，每个进程只构建一次DFA树"""
+    manager = SensitiveWordManager()
+    manager.initialize(base_path, risk_keywords)
+    return manager
+
+
 # 导出
-__all__ = ["DFAFilter", "SensitiveWordManager"]
+__all__ = ["DFAFilter", "SensitiveWordManager", "get_shared_sensitive_word_manager"]
@@ -1,13 +1,39 @@
 """
 意图识别核心数据模型
 """
+import os
+import sys
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
-
-
-class QueryIntentType(Enum):
-    """查询意图类型"""
+from pathlib import Path
+from types import MappingProxyType
+from dataclasses import FrozenInstanceError, dataclass, field, fields
+from typing import List, Mapping, Optional, Dict, Any, Sequence
+
+from .utils import KeywordMatcher, dump_json_bytes, load_json_file
+
+
+# 默认意图类型与安全级别：模块级只读单例，所有默认配置共享同一份映射
+_DEFAULT_INTENT_TYPES = MappingProxyType({
+    "knowledge_query": "知识查询",
+    "factual_question": "事实性问题",
+    "analytical_question": "分析性问题",
+    "procedural_question": "程序性问题",
+    "creative_request": "创意请求",
+    "greeting": "问候",
+    "unclear": "意图不明确",
+    "illegal_content": "非法内容"
+})
+
+_DEFAULT_SAFETY_LEVELS = MappingProxyType({
+    "safe": "安全",
+    "suspicious": "可疑",
+    "unsafe": "不安全",
+    "illegal": "非法"
+})
+
+
+class QueryIntentType(str, Enum):
+    """查询意图类型（str子类，可直接与字符串比较、作字典键及JSON序列化）"""
     KNOWLEDGE_QUERY = "knowledge_query"  # 知识查询
     FACTUAL_QUESTION = "factual_question"  # 事实性问题
     ANALYTICAL_QUESTION = "analytical_question"  # 分析性问题
@@ -18,83 +44,118 @@ class QueryIntentType(Enum):
     ILLEGAL_CONTENT = "illegal_content"  # 非法内容
 
 
-class ContentSafetyLevel(Enum):
-    """内容安全级别"""
+class ContentSafetyLevel(str, Enum):
+    """内容安全级别（str子类，可直接与字符串比较、作字典键及JSON序列化）"""
     SAFE = "safe"  # 安全
     SUSPICIOUS = "suspicious"  # 可疑
     UNSAFE = "unsafe"  # 不安全
     ILLEGAL = "illegal"  # 非法
 
 
-@dataclass
-class QueryAnalysisResult:
-    """查询分析结果"""
-    original_query: str
-    processed_query: str
-    intent_type: QueryIntentType
-    safety_level: ContentSafetyLevel
-    confidence: float
-    suggestions: List[str]
-    risk_factors: List[str]
-    enhanced_query: Optional[str] = None
-    should_reject: bool = False
-    rejection_reason: Optional[str] = None
-    safety_tips: List[str] = None
-    safe_alternatives: List[str] = None
-    processing_time: float = 0.0
-    
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.safety_tips is None:
-            self.safety_tips = []
-        if self.safe_alternatives is None:
-            self.safe_alternatives = []
+# 只读结果类型在 __init__ 中绕过 __setattr__ 直接写入槽位
+_set = object.__setattr__
+# 结果类型中未提供的序列字段共享同一个空元组，不再为每个实例分配空列表（下游只做遍历）
+_EMPTY = ()
 
 
-@dataclass
-class SafetyCheckResult:
-    """安全检查结果"""
-    is_safe: bool
-    safety_level: str
-    risk_factors: List[str]
-    confidence: float
-    reason: str
-    intent_direction: Optional[str] = None
-    sensitive_words: List[str] = None
-    filtered_text: Optional[str] = None
-    
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.sensitive_words is None:
-            self.sensitive_words = []
+class _SlotsResult:
+    """基于 __slots__ 的只读结果类型基类，提供与 frozen dataclass 一致的 repr/比较行为"""
+    __slots__ = ()
 
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
 
-@dataclass
-class IntentAnalysisResult:
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def replace(self, **changes):
+        """返回替换部分字段后的新实例（对应 dataclasses.replace）"""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def __repr__(self) -> str:
+        items = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({items})"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+
+class QueryAnalysisResult(_SlotsResult):
+    """查询分析结果"""
+    __slots__ = (
+        "original_query", "processed_query", "intent_type", "safety_level", "confidence",
+        "suggestions", "risk_factors", "enhanced_query", "should_reject", "rejection_reason",
+        "safety_tips", "safe_alternatives", "processing_time"
+    )
+
+    def __init__(self, original_query: str, processed_query: str, intent_type: QueryIntentType,
+                 safety_level: ContentSafetyLevel, confidence: float, suggestions: Sequence[str],
+                 risk_factors: Sequence[str], enhanced_query: Optional[str] = None,
+                 should_reject: bool = False, rejection_reason: Optional[str] = None,
+                 safety_tips: Sequence[str] = (), safe_alternatives: Sequence[str] = (),
+                 processing_time: float = 0.0):
+        _set(self, "original_query", original_query)
+        _set(self, "processed_query", processed_query)
+        _set(self, "intent_type", intent_type)
+        _set(self, "safety_level", safety_level)
+        _set(self, "confidence", confidence)
+        _set(self, "suggestions", _EMPTY if suggestions is None else suggestions)
+        _set(self, "risk_factors", _EMPTY if risk_factors is None else risk_factors)
+        _set(self, "enhanced_query", enhanced_query)
+        _set(self, "should_reject", should_reject)
+        _set(self, "rejection_reason", rejection_reason)
+        _set(self, "safety_tips", _EMPTY if safety_tips is None else safety_tips)
+        _set(self, "safe_alternatives", _EMPTY if safe_alternatives is None else safe_alternatives)
+        _set(self, "processing_time", processing_time)
+
+
+class SafetyCheckResult(_SlotsResult):
+    """安全检查结果"""
+    __slots__ = (
+        "is_safe", "safety_level", "risk_factors", "confidence", "reason",
+        "intent_direction", "sensitive_words", "filtered_text"
+    )
+
+    def __init__(self, is_safe: bool, safety_level: str, risk_factors: Sequence[str],
+                 confidence: float, reason: str, intent_direction: Optional[str] = None,
+                 sensitive_words: Sequence[str] = (), filtered_text: Optional[str] = None):
+        _set(self, "is_safe", is_safe)
+        _set(self, "safety_level", safety_level)
+        _set(self, "risk_factors", _EMPTY if risk_factors is None else risk_factors)
+        _set(self, "confidence", confidence)
+        _set(self, "reason", reason)
+        _set(self, "intent_direction", intent_direction)
+        _set(self, "sensitive_words", _EMPTY if sensitive_words is None else sensitive_words)
+        _set(self, "filtered_text", filtered_text)
+
+
+class IntentAnalysisResult(_SlotsResult):
     """意图分析结果"""
-    intent_type: str
-    confidence: float
-    reason: str
-    keywords: List[str]
-    
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.keywords is None:
-            self.keywords = []
+    __slots__ = ("intent_type", "confidence", "reason", "keywords")
 
+    def __init__(self, intent_type: str, confidence: float, reason: str, keywords: Sequence[str]):
+        _set(self, "intent_type", intent_type)
+        _set(self, "confidence", confidence)
+        _set(self, "reason", reason)
+        _set(self, "keywords", _EMPTY if keywords is None else keywords)
 
-@dataclass
-class QueryEnhancementResult:
+
+class QueryEnhancementResult(_SlotsResult):
     """查询增强结果"""
-    should_enhance: bool
-    enhanced_query: Optional[str]
-    enhancement_reason: str
-    suggestions: List[str]
-    
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.suggestions is None:
-            self.suggestions = []
+    __slots__ = ("should_enhance", "enhanced_query", "enhancement_reason", "suggestions")
+
+    def __init__(self, should_enhance: bool, enhanced_query: Optional[str],
+                 enhancement_reason: str, suggestions: Sequence[str]):
+        _set(self, "should_enhance", should_enhance)
+        _set(self, "enhanced_query", enhanced_query)
+        _set(self, "enhancement_reason", enhancement_reason)
+        _set(self, "suggestions", _EMPTY if suggestions is None else suggestions)
 
 
 @dataclass
@@ -103,55 +164,76 @@ class LLMPromptConfig:
     safety_check_prompt: Optional[str] = None
     intent_analysis_prompt: Optional[str] = None
     query_enhancement_prompt: Optional[str] = None
-    custom_prompts: Optional[Dict[str, str]] = None
-
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.custom_prompts is None:
-            self.custom_prompts = {}
+    custom_prompts: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
 class IntentTypeConfig:
     """意图类型配置"""
-    intent_types: Dict[str, str]  # intent_type -> display_name
-    custom_intent_types: Optional[Dict[str, str]] = None
-    intent_priorities: Optional[Dict[str, int]] = None
-    intent_categories: Optional[Dict[str, str]] = None
-
-    def __post_init__(self):
-        """初始化后处理"""
-        if self.custom_intent_types is None:
-            self.custom_intent_types = {}
-        if self.intent_priorities is None:
-            self.intent_priorities = {}
-        if self.intent_categories is None:
-            self.intent_categories = {}
+    intent_types: Mapping[str, str]  # intent_type -> display_name（只读）
+    custom_intent_types: Dict[str, str] = field(default_factory=dict)
+    intent_priorities: Dict[str, int] = field(default_factory=dict)
+    intent_categories: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
 class SafetyConfig:
     """安全检查配置"""
-    safety_levels: Dict[str, str]  # level -> display_name
-    risk_keywords: Optional[List[str]] = None
-    educational_patterns: Optional[List[str]] = None
-    instructive_patterns: Optional[List[str]] = None
-    custom_safety_rules: Optional[Dict[str, Any]] = None
+    safety_levels: Mapping[str, str]  # level -> display_name（只读）
+    risk_keywords: List[str] = field(default_factory=list)
+    educational_patterns: List[str] = field(default_factory=list)
+    instructive_patterns: List[str] = field(default_factory=list)
+    custom_safety_rules: Dict[str, Any] = field(default_factory=dict)
 
     def __post_init__(self):
-        """初始化后处理"""
-        if self.risk_keywords is None:
-            self.risk_keywords = []
-        if self.educational_patterns is None:
-            self.educational_patterns = []
-        if self.instructive_patterns is None:
-            self.instructive_patterns = []
-        if self.custom_safety_rules is None:
-            self.custom_safety_rules = {}
+        # 加载配置时即编译匹配器（普通属性而非字段，不参与序列化）
+        self.build_matcher()
+
+    def build_matcher(self) -> KeywordMatcher:
+        """将风险关键词/教育模式/实施模式编译成单个匹配器；重新赋值这些列表后需调用"""
+        self._matcher = KeywordMatcher({
+            "risk_keyword": self.risk_keywords,
+            "educational": self.educational_patterns,
+            "instructive": self.instructive_patterns
+        })
+        return self._matcher
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        """预先编译好的安全模式匹配器"""
+        return self._matcher
+
+
+def _intern_keys(mapping: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """驻留从JSON解析出的字典键，与代码中的字符串字面量共享同一对象，查找时可走指针相等快速路径"""
+    if not mapping:
+        return {}
+    return {sys.intern(key): value for key, value in mapping.items()}
+
+
+def _fields_to_dict(obj) -> Dict[str, Any]:
+    """按字段声明顺序将配置dataclass浅转换为字典（只读映射转为普通dict以便序列化）
+
+    不使用 dataclasses.asdict：它会深拷贝每个字段，且无法拷贝 MappingProxyType。
+    """
+    result = {}
+    for f in fields(obj):
+        value = getattr(obj, f.name)
+        result[f.name] = dict(value) if isinstance(value, MappingProxyType) else value
+    return result
 
 
 class ProcessorConfig:
     """处理器配置 - 支持灵活配置"""
+    __slots__ = (
+        "confidence_threshold", "enable_llm", "enable_dfa_filter", "enable_query_enhancement",
+        "sensitive_vocabulary_path", "config_path", "_saved_dir",
+        "llm_prompt_config", "intent_type_config", "safety_config"
+    )
+
+    # 配置对象通常为进程内单例，按身份比较与哈希，供下游以配置为键做缓存（显式声明，防止重构时被字段比较取代）
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
 
     def __init__(self,
                  confidence_threshold: float = 0.7,
@@ -169,41 +251,25 @@ class ProcessorConfig:
         self.enable_query_enhancement = enable_query_enhancement
         self.sensitive_vocabulary_path = sensitive_vocabulary_path
         self.config_path = config_path
+        # 最近一次保存时已确认存在的目录
+        self._saved_dir: Optional[Path] = None
 
         # 配置对象
         self.llm_prompt_config = llm_prompt_config or LLMPromptConfig()
         self.intent_type_config = intent_type_config or IntentTypeConfig(
-            intent_types={
-                "knowledge_query": "知识查询",
-                "factual_question": "事实性问题",
-                "analytical_question": "分析性问题",
-                "procedural_question": "程序性问题",
-                "creative_request": "创意请求",
-                "greeting": "问候",
-                "unclear": "意图不明确",
-                "illegal_content": "非法内容"
-            }
+            intent_types=_DEFAULT_INTENT_TYPES
         )
         self.safety_config = safety_config or SafetyConfig(
-            safety_levels={
-                "safe": "安全",
-                "suspicious": "可疑",
-                "unsafe": "不安全",
-                "illegal": "非法"
-            }
+            safety_levels=_DEFAULT_SAFETY_LEVELS
         )
 
     @classmethod
     def from_file(cls, config_path: str) -> 'ProcessorConfig':
         """从配置文件加载配置"""
-        import json
-        import os
-
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"配置文件不存在: {config_path}")
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config_data = json.load(f)
+        config_data = load_json_file(config_path)
 
         # 解析基础配置
         base_config = config_data.get('base', {})
@@ -214,26 +280,27 @@ class ProcessorConfig:
             safety_check_prompt=prompt_data.get('safety_check_prompt'),
             intent_analysis_prompt=prompt_data.get('intent_analysis_prompt'),
             query_enhancement_prompt=prompt_data.get('query_enhancement_prompt'),
-            custom_prompts=prompt_data.get('custom_prompts', {})
+            custom_prompts=prompt_data.get('custom_prompts') or {}
         )
 
         # 解析意图类型配置
         intent_data = config_data.get('intent_types', {})
         intent_type_config = IntentTypeConfig(
-            intent_types=intent_data.get('intent_types', {}),
-            custom_intent_types=intent_data.get('custom_intent_types', {}),
-            intent_priorities=intent_data.get('intent_priorities', {}),
-            intent_categories=intent_data.get('intent_categories', {})
+            # 内置意图类型表只读，与默认表一样以只读映射保存
+            intent_types=MappingProxyType(_intern_keys(intent_data.get('intent_types'))),
+            custom_intent_types=_intern_keys(intent_data.get('custom_intent_types')),
+            intent_priorities=_intern_keys(intent_data.get('intent_priorities')),
+            intent_categories=_intern_keys(intent_data.get('intent_categories'))
         )
 
         # 解析安全配置
         safety_data = config_data.get('safety', {})
         safety_config = SafetyConfig(
-            safety_levels=safety_data.get('safety_levels', {}),
-            risk_keywords=safety_data.get('risk_keywords', []),
-            educational_patterns=safety_data.get('educational_patterns', []),
-            instructive_patterns=safety_data.get('instructive_patterns', []),
-            custom_safety_rules=safety_data.get('custom_safety_rules', {})
+            safety_levels=MappingProxyType(_intern_keys(safety_data.get('safety_levels'))),
+            risk_keywords=safety_data.get('risk_keywords') or [],
+            educational_patterns=safety_data.get('educational_patterns') or [],
+            instructive_patterns=safety_data.get('instructive_patterns') or [],
+            custom_safety_rules=safety_data.get('custom_safety_rules') or {}
         )
 
         return cls(
@@ -259,37 +326,22 @@ class ProcessorConfig:
                 'enable_query_enhancement': self.enable_query_enhancement,
                 'sensitive_vocabulary_path': self.sensitive_vocabulary_path
             },
-            'llm_prompts': {
-                'safety_check_prompt': self.llm_prompt_config.safety_check_prompt,
-                'intent_analysis_prompt': self.llm_prompt_config.intent_analysis_prompt,
-                'query_enhancement_prompt': self.llm_prompt_config.query_enhancement_prompt,
-                'custom_prompts': self.llm_prompt_config.custom_prompts
-            },
-            'intent_types': {
-                'intent_types': self.intent_type_config.intent_types,
-                'custom_intent_types': self.intent_type_config.custom_intent_types,
-                'intent_priorities': self.intent_type_config.intent_priorities,
-                'intent_categories': self.intent_type_config.intent_categories
-            },
-            'safety': {
-                'safety_levels': self.safety_config.safety_levels,
-                'risk_keywords': self.safety_config.risk_keywords,
-                'educational_patterns': self.safety_config.educational_patterns,
-                'instructive_patterns': self.safety_config.instructive_patterns,
-                'custom_safety_rules': self.safety_config.custom_safety_rules
-            }
+            'llm_prompts': _fields_to_dict(self.llm_prompt_config),
+            'intent_types': _fields_to_dict(self.intent_type_config),
+            'safety': _fields_to_dict(self.safety_config)
         }
 
     def save_to_file(self, config_path: str):
-        """保存配置到文件"""
-        import json
-        import os
-
-        # 确保目录存在
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
-
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        """保存配置到文件（先写临时文件再原子替换，读取方不会看到写了一半的文件）"""
+        path = Path(config_path)
+        # 确保目录存在（同一目录在进程内只创建一次）
+        if self._saved_dir != path.parent:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._saved_dir = path.parent
+
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(dump_json_bytes(self.to_dict()))
+        tmp_path.replace(path)
 
 
 # 导出所有模型
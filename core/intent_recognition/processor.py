@@ -2,53 +2,120 @@
 查询处理器 - 基于大模型的意图识别、意图补充、意图修复和内容过滤
 优化版本 - 整合参考项目最佳实践
 """
-import re
+import asyncio
 import json
+import re
 import time
 from typing import Dict, List, Optional, Any, Callable
 
+from common.config import settings
 from common.logging_utils import logger_manager
 from .models import (
     QueryIntentType, ContentSafetyLevel, QueryAnalysisResult,
     SafetyCheckResult, IntentAnalysisResult, QueryEnhancementResult,
     ProcessorConfig
 )
-from .dfa_filter import SensitiveWordManager
-from .utils import QueryUtils, IntentPatterns, EnhancementTemplates
+from .dfa_filter import SensitiveWordManager, get_shared_sensitive_word_manager
+from .utils import (
+    QueryUtils, PRECOMPILED_PATTERNS, EDUCATIONAL_PATTERNS, INSTRUCTIVE_PATTERNS,
+    DEFAULT_ENHANCEMENT_TEMPLATES, loads_json
+)
 from .config_manager import get_processor_config
+from .semantic_cache import IntentResultCache, normalize_vector
 
 logger = logger_manager.get_logger("intent_processor")
 
+# 基础规则检查使用的非法关键词
+_BASIC_ILLEGAL_KEYWORDS = (
+    "赌博", "毒品", "色情", "暴力", "诈骗", "非法", "违法",
+    "gambling", "drugs", "pornography", "violence", "fraud"
+)
+
+# 合法的意图类型和安全级别取值（成员判断代替构造枚举捕获异常）
+_VALID_INTENT_TYPES = frozenset(member.value for member in QueryIntentType)
+_VALID_SAFETY_LEVELS = frozenset(member.value for member in ContentSafetyLevel)
+
+# 程序性提问词（教育导向查询中用于区分程序性问题和知识查询）
+_HOW_QUESTION_RE = re.compile(r"如何|怎样|怎么|how", re.IGNORECASE)
+
+# 大模型响应解析：思考过程标签、包裹JSON的代码块标记
+_THINK_RE = re.compile(r"<think>(.*?)</think>(.*)", re.S)
+_JSON_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.S)
+
 
 def extracted_think_and_answer(response_content: str) -> tuple[str, str]:
     """提取大模型响应中的思考过程和最终答案"""
     try:
-        think_str = response_content.split("<think>")[1]
-        think_str = think_str.split("</think>")[0].strip()
-        answer_str = response_content.split("</think>")[1].strip()
-        return think_str, answer_str
-    except (IndexError, AttributeError):
+        match = _THINK_RE.search(response_content)
+    except TypeError:
         return "", response_content
+    if not match:
+        return "", response_content
+    return match.group(1).strip(), match.group(2).strip()
+
+
+def _extract_json_payload(response: str) -> str:
+    """去除包裹JSON的代码块标记，返回去掉首尾空白的正文"""
+    match = _JSON_FENCE_RE.match(response)
+    return match.group(1) if match else response.strip()
+
+
+class _LazyQueryVector:
+    """按需计算的查询向量：首次需要语义查找时才请求Embedding，同一请求的各环节共享同一次计算"""
+
+    __slots__ = ("_factory", "_task")
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._task: Optional[asyncio.Future] = None
+
+    async def get(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._factory())
+        # 某个环节被取消时不影响其他环节继续等待同一次计算
+        return await asyncio.shield(self._task)
 
 
 class IntentRecognitionProcessor:
     """基于大模型的意图识别处理器"""
 
-    def __init__(self, config: ProcessorConfig = None, llm_func: Optional[Callable] = None):
+    def __init__(self, config: ProcessorConfig = None, llm_func: Optional[Callable] = None,
+                 sensitive_word_manager: Optional[SensitiveWordManager] = None,
+                 intent_patterns: Optional[tuple] = None,
+                 embedding_func: Optional[Callable] = None):
         self.config = config or get_processor_config()
         self.llm_func = llm_func
+        # 可选的向量函数，提供时相似查询也能命中结果缓存
+        self.embedding_func = embedding_func
+
+        # 大模型结果缓存：安全检查和意图分析支持语义命中，查询增强只做精确命中
+        self.result_cache = None
+        if settings.intent_result_cache:
+            self.result_cache = IntentResultCache(
+                capacity=settings.intent_result_cache_size,
+                ttl=settings.cache_ttl,
+                thresholds={
+                    "safety": settings.intent_safety_cache_threshold,
+                    "intent": settings.intent_analysis_cache_threshold
+                }
+            )
 
-        # 初始化敏感词管理器
+        # 初始化敏感词管理器（未指定时复用按词库路径共享的实例）
         self.sensitive_word_manager = None
         if self.config.enable_dfa_filter:
-            self.sensitive_word_manager = SensitiveWordManager()
-            self.sensitive_word_manager.initialize(self.config.sensitive_vocabulary_path)
+            self.sensitive_word_manager = sensitive_word_manager or get_shared_sensitive_word_manager(
+                self.config.sensitive_vocabulary_path,
+                tuple(self.config.safety_config.risk_keywords)
+            )
 
-        # 加载模式和模板
-        self.intent_patterns = IntentPatterns.get_default_patterns()
-        self.educational_patterns = IntentPatterns.get_educational_patterns()
-        self.instructive_patterns = IntentPatterns.get_instructive_patterns()
-        self.enhancement_templates = EnhancementTemplates.get_default_templates()
+        # 加载模式和模板（模块级只读常量，各实例共享引用；意图模式使用预编译正则）
+        self.intent_patterns = intent_patterns or PRECOMPILED_PATTERNS
+        self.educational_patterns = EDUCATIONAL_PATTERNS
+        self.instructive_patterns = INSTRUCTIVE_PATTERNS
+        self.enhancement_templates = DEFAULT_ENHANCEMENT_TEMPLATES
+
+        # 限制单个处理器对大模型服务的并发请求数
+        self._llm_semaphore = asyncio.Semaphore(max(1, settings.intent_llm_max_concurrency))
 
         # 大模型提示词模板
         self._init_prompts()
@@ -68,6 +135,12 @@ class IntentRecognitionProcessor:
         # 加载自定义提示词
         self.custom_prompts = prompt_config.custom_prompts or {}
 
+        # 合并分析提示词：一次调用同时完成安全检查、意图分析和查询增强，可通过 custom_prompts 覆盖；
+        # 单项提示词被自定义后不再合并（见 _should_combine_llm_calls）
+        self.combined_analysis_prompt = (
+            self.custom_prompts.get("combined_analysis") or self._get_default_combined_prompt()
+        )
+
     def _get_default_safety_prompt(self) -> str:
         """获取默认安全检查提示词"""
         # 动态生成安全级别和风险关键词
@@ -166,6 +239,74 @@ class IntentRecognitionProcessor:
 注意：
 - 只有在确实能改进查询质量时才建议增强
 - 严格按照JSON格式返回，不要包含其他内容
+"""
+
+    def _get_default_combined_prompt(self) -> str:
+        """获取默认合并分析提示词（安全检查 + 意图分析 + 查询增强）"""
+        safety_levels = list(self.config.safety_config.safety_levels.keys())
+        risk_keywords = self.config.safety_config.risk_keywords
+        educational_patterns = self.config.safety_config.educational_patterns
+        instructive_patterns = self.config.safety_config.instructive_patterns
+        all_intents = {**self.config.intent_type_config.intent_types,
+                       **self.config.intent_type_config.custom_intent_types}
+        intent_list = [f"{i}. {intent_type}: {display_name}"
+                       for i, (intent_type, display_name) in enumerate(all_intents.items(), 1)]
+
+        # 未启用查询增强时不要求模型生成增强结果，节省输出token
+        enhancement_task = ""
+        enhancement_schema = ""
+        if self.config.enable_query_enhancement:
+            enhancement_task = """
+三、查询优化：判断查询是否需要增强，如需要请给出优化后的查询
+优化方向：补充缺失的关键信息、明确查询的具体范围、添加相关的上下文、优化表达方式
+只有在确实能改进查询质量时才建议增强
+"""
+            enhancement_schema = """,
+    "enhancement": {{{{
+        "should_enhance": true/false,
+        "enhanced_query": "优化后的查询（如果需要优化）",
+        "enhancement_reason": "优化原因",
+        "suggestions": ["建议1", "建议2"]
+    }}}}"""
+
+        return f"""
+你是一个查询分析专家。请对以下查询同时完成下列分析任务。
+
+查询内容："{{query}}"
+
+一、安全审核：分析查询是否涉及违法违规内容
+1. 是否涉及违法犯罪活动（如{', '.join(risk_keywords[:5])}等）
+2. 是否涉及不当内容（如色情、仇恨言论等）
+3. 查询意图是正向教育/防范，还是负面实施/教程
+正向教育模式示例：{', '.join(educational_patterns[:3])}
+负面指导模式示例：{', '.join(instructive_patterns[:3])}
+对于正向教育内容应标记为安全，对于可能的违法指导应标记为不安全
+
+二、意图分析：从以下意图类型中选择一个
+{chr(10).join(intent_list)}
+{enhancement_task}
+请以JSON格式返回分析结果：
+{{{{
+    "safety": {{{{
+        "is_safe": true/false,
+        "safety_level": "{'/'.join(safety_levels)}",
+        "risk_factors": ["风险因素1", "风险因素2"],
+        "intent_direction": "educational/instructive/neutral",
+        "confidence": 0.95,
+        "reason": "详细分析原因"
+    }}}},
+    "intent": {{{{
+        "intent_type": "knowledge_query",
+        "confidence": 0.95,
+        "reason": "用户询问某个概念的定义，属于知识查询",
+        "keywords": ["关键词1", "关键词2"]
+    }}}}{enhancement_schema}
+}}}}
+
+注意：
+- 严格按照JSON格式返回，不要包含其他内容
+- confidence 应该是 0-1 之间的数值
+- intent_type 必须是上述列表中的一个
 """
 
     def _cache_config_info(self):
@@ -176,6 +317,8 @@ class IntentRecognitionProcessor:
         self._cached_risk_keywords = set(self.config.safety_config.risk_keywords)
         self._cached_educational_patterns = self.config.safety_config.educational_patterns
         self._cached_instructive_patterns = self.config.safety_config.instructive_patterns
+        # 按当前模式列表重新编译安全模式匹配器，避免首个请求承担构建开销
+        self.config.safety_config.build_matcher()
 
     def reload_config(self, new_config: ProcessorConfig = None):
         """重新加载配置"""
@@ -188,10 +331,16 @@ class IntentRecognitionProcessor:
         # 重新初始化组件
         self._init_prompts()
         self._cache_config_info()
+        if self.result_cache:
+            self.result_cache.clear()
 
-        # 重新初始化敏感词管理器
-        if self.config.enable_dfa_filter and self.sensitive_word_manager:
-            self.sensitive_word_manager.initialize(self.config.sensitive_vocabulary_path)
+        # 重新初始化敏感词管理器（重建共享实例，以加载词库变更）
+        if self.config.enable_dfa_filter:
+            get_shared_sensitive_word_manager.cache_clear()
+            self.sensitive_word_manager = get_shared_sensitive_word_manager(
+                self.config.sensitive_vocabulary_path,
+                tuple(self.config.safety_config.risk_keywords)
+            )
 
         logger.info("处理器配置已重新加载")
 
@@ -234,6 +383,12 @@ class IntentRecognitionProcessor:
             # 自定义提示词
             self.config.llm_prompt_config.custom_prompts[prompt_type] = prompt_content
             self.custom_prompts[prompt_type] = prompt_content
+            if prompt_type == "combined_analysis":
+                self.combined_analysis_prompt = prompt_content
+
+        # 提示词变化后历史结果不再可信
+        if self.result_cache:
+            self.result_cache.clear()
 
         logger.info(f"更新提示词: {prompt_type}")
 
@@ -245,6 +400,8 @@ class IntentRecognitionProcessor:
             return self.intent_analysis_prompt
         elif prompt_type == "query_enhancement":
             return self.query_enhancement_prompt
+        elif prompt_type == "combined_analysis":
+            return self.combined_analysis_prompt
         else:
             return self.custom_prompts.get(prompt_type)
 
@@ -256,13 +413,30 @@ class IntentRecognitionProcessor:
             logger.info(f"开始处理查询: {query[:50]}...")
 
             # 1. 查询清理和标准化
-            processed_query = await self._clean_and_normalize_query(query)
+            processed_query = self._clean_and_normalize_query(query)
             logger.debug(f"查询清理完成: {processed_query[:50]}...")
 
-            # 2. 安全检查
-            logger.debug("开始安全检查")
-            safety_result = await self._safety_check(processed_query)
-            logger.info(f"安全检查完成: {safety_result.safety_level}, 安全: {safety_result.is_safe}")
+            # 查询向量按需计算：只有精确查找未命中且需要语义查找时才请求Embedding，且每个请求最多一次
+            query_vector = self._lazy_query_vector(processed_query)
+
+            # 合并分析：一次大模型调用得到三项子结果，后续各环节直接取用，子结果无效时仍走各自的回退
+            prefetched = None
+            if self._should_combine_llm_calls():
+                prefetched = await self._llm_combined_analysis(processed_query, query_vector)
+
+            # 2/3. 安全检查与意图识别并发执行，安全检查不通过时取消意图识别
+            logger.debug("开始安全检查与意图识别")
+            intent_task = asyncio.create_task(
+                self._intent_analysis(processed_query, query_vector, prefetched)
+            )
+            try:
+                safety_result = await self._safety_check(processed_query, query_vector, prefetched)
+                logger.info(f"安全检查完成: {safety_result.safety_level}, 安全: {safety_result.is_safe}")
+                if safety_result.is_safe:
+                    intent_result = await intent_task
+            finally:
+                if not intent_task.done():
+                    intent_task.cancel()
 
             # 如果查询不安全，返回拒绝结果
             if not safety_result.is_safe:
@@ -287,24 +461,21 @@ class IntentRecognitionProcessor:
                     processing_time=time.time() - start_time
                 )
 
-            # 3. 意图识别
-            logger.debug("开始意图识别")
-            intent_result = await self._intent_analysis(processed_query)
             logger.info(f"意图识别完成: {intent_result.intent_type}")
 
-            # 4. 查询增强
+            # 4. 查询增强（依赖意图类型，在意图识别完成后执行）
             enhanced_query = None
             if self.config.enable_query_enhancement and safety_result.is_safe:
                 logger.debug("开始查询增强")
                 enhancement_result = await self._query_enhancement(
-                    processed_query, intent_result.intent_type, safety_result.safety_level
+                    processed_query, intent_result.intent_type, safety_result.safety_level, prefetched
                 )
                 if enhancement_result.should_enhance:
                     enhanced_query = enhancement_result.enhanced_query
                     logger.info(f"查询增强完成: {enhanced_query[:50] if enhanced_query else 'None'}...")
 
             # 5. 生成建议
-            suggestions = intent_result.keywords + (enhancement_result.suggestions if 'enhancement_result' in locals() else [])
+            suggestions = [*intent_result.keywords, *(enhancement_result.suggestions if 'enhancement_result' in locals() else ())]
 
             processing_time = time.time() - start_time
             logger.info(f"查询处理完成，总耗时: {processing_time:.2f}s")
@@ -343,18 +514,35 @@ class IntentRecognitionProcessor:
                 processing_time=time.time() - start_time
             )
 
-    async def _clean_and_normalize_query(self, query: str) -> str:
+    def _clean_and_normalize_query(self, query: str) -> str:
         """清理和标准化查询"""
-        return await QueryUtils.clean_and_normalize_query(query)
+        return QueryUtils.clean_and_normalize_query(query)
+
+    def _lazy_query_vector(self, query: str) -> Optional[_LazyQueryVector]:
+        """仅在会调用大模型、启用结果缓存且提供了向量函数时返回按需计算的查询向量"""
+        if not (self.result_cache and self.embedding_func and self.config.enable_llm and self.llm_func):
+            return None
+        return _LazyQueryVector(lambda: self._embed_query(query))
 
-    async def _safety_check(self, query: str) -> SafetyCheckResult:
+    async def _embed_query(self, query: str):
+        """计算查询的单位向量，失败返回None"""
+        try:
+            embeddings = await self.embedding_func([query])
+            return normalize_vector(embeddings[0])
+        except Exception as e:
+            # 向量化失败时只做精确命中，不影响主流程
+            logger.warning(f"查询向量化失败，结果缓存仅精确匹配: {e}")
+            return None
+
+    async def _safety_check(self, query: str, query_vector=None,
+                            prefetched: Optional[Dict[str, Any]] = None) -> SafetyCheckResult:
         """安全检查 - 优先使用大模型，失败时回退到DFA"""
         try:
             # 第一优先级：使用大模型检查
             if self.config.enable_llm and self.llm_func:
                 try:
                     logger.debug("尝试使用大模型进行安全检查")
-                    result = await self._llm_safety_check(query)
+                    result = await self._llm_safety_check(query, query_vector, prefetched)
                     logger.debug("大模型安全检查成功")
                     return result
                 except Exception as e:
@@ -389,56 +577,220 @@ class IntentRecognitionProcessor:
                 reason=f"安全检查异常: {e}"
             )
 
-    async def _llm_safety_check(self, query: str) -> SafetyCheckResult:
-        """使用大模型进行安全检查"""
-        if not self.llm_func:
-            raise Exception("LLM函数未提供")
+    async def _call_llm(self, prompt: str) -> str:
+        """调用大模型（受并发上限约束）"""
+        async with self._llm_semaphore:
+            return await self.llm_func(prompt)
+
+    def _should_combine_llm_calls(self) -> bool:
+        """是否使用合并分析（一次大模型调用完成三项任务）
+
+        自定义了安全检查/意图分析/查询增强提示词时合并分析会绕过它们，
+        因此仅在三者均未自定义、或显式配置了 combined_analysis 提示词时才合并。
+        """
+        if not (settings.intent_llm_combined_analysis and self.config.enable_llm and self.llm_func):
+            return False
+        prompt_config = self.config.llm_prompt_config
+        if (prompt_config.custom_prompts or {}).get("combined_analysis"):
+            return True
+        return not (
+            prompt_config.safety_check_prompt
+            or prompt_config.intent_analysis_prompt
+            or prompt_config.query_enhancement_prompt
+        )
+
+    @staticmethod
+    def _parse_llm_json(response: str) -> Dict[str, Any]:
+        """清理大模型响应（思考过程、代码块标记）并解析为JSON对象"""
+        if not response or not response.strip():
+            raise Exception("大模型返回空响应")
+
+        # 处理包含 <think> 标签的响应
+        if "<think>" in response and "</think>" in response:
+            _, response = extracted_think_and_answer(response)
+
+        # 清理响应格式
+        response_clean = _extract_json_payload(response)
+
+        if not response_clean:
+            raise Exception("清理后的响应为空")
 
         try:
-            prompt = self.safety_check_prompt.format(query=query)
-            logger.debug(f"发送安全检查请求到大模型，查询长度: {len(query)}")
+            result = loads_json(response_clean)
+        except json.JSONDecodeError as e:
+            raise Exception(f"JSON解析失败: {e}, 响应内容: {response_clean[:200]}")
+
+        if not isinstance(result, dict):
+            raise Exception(f"大模型响应不是JSON对象: {response_clean[:200]}")
+        return result
+
+    @staticmethod
+    def _require_fields(result: Dict[str, Any], required_fields: tuple):
+        """验证必要字段"""
+        for field in required_fields:
+            if field not in result:
+                raise Exception(f"大模型响应缺少必要字段: {field}")
+
+    def _build_safety_result(self, result: Dict[str, Any]) -> SafetyCheckResult:
+        """由大模型返回的字段构建安全检查结果"""
+        self._require_fields(result, ("is_safe", "safety_level", "confidence", "reason"))
+
+        # 无效的安全级别视为该结果无效，由上层回退到DFA/规则检查
+        safety_level = result.get("safety_level", "safe")
+        if safety_level not in _VALID_SAFETY_LEVELS:
+            raise Exception(f"无效的安全级别: {safety_level}")
 
-            response = await self.llm_func(prompt)
+        return SafetyCheckResult(
+            is_safe=result.get("is_safe", True),
+            safety_level=safety_level,
+            risk_factors=result.get("risk_factors", []),
+            confidence=result.get("confidence", 0.8),
+            reason=result.get("reason", "大模型安全检查"),
+            intent_direction=result.get("intent_direction")
+        )
+
+    def _build_intent_result(self, result: Dict[str, Any]) -> IntentAnalysisResult:
+        """由大模型返回的字段构建意图分析结果"""
+        self._require_fields(result, ("intent_type", "confidence", "reason"))
 
-            if not response or not response.strip():
-                raise Exception("大模型返回空响应")
+        # 验证intent_type是否有效
+        intent_type_str = result.get("intent_type", "unclear")
+        if intent_type_str not in _VALID_INTENT_TYPES:
+            logger.warning(f"无效的意图类型: {intent_type_str}，使用unclear")
+            intent_type_str = "unclear"
 
-            # 处理包含 <think> 标签的响应
-            if "<think>" in response and "</think>" in response:
-                _, response = extracted_think_and_answer(response)
+        return IntentAnalysisResult(
+            intent_type=intent_type_str,
+            confidence=result.get("confidence", 0.8),
+            reason=result.get("reason", "大模型意图分析"),
+            keywords=result.get("keywords", [])
+        )
 
-            # 清理响应格式
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
+    def _build_enhancement_result(self, result: Dict[str, Any]) -> QueryEnhancementResult:
+        """由大模型返回的字段构建查询增强结果"""
+        self._require_fields(result, ("should_enhance", "enhancement_reason"))
+        should_enhance = result.get("should_enhance", False)
+        return QueryEnhancementResult(
+            should_enhance=should_enhance,
+            enhanced_query=result.get("enhanced_query") if should_enhance else None,
+            enhancement_reason=result.get("enhancement_reason", "大模型增强"),
+            suggestions=result.get("suggestions", [])
+        )
 
-            if not response_clean:
-                raise Exception("清理后的响应为空")
+    async def _llm_combined_analysis(self, query: str, query_vector=None) -> Optional[Dict[str, Any]]:
+        """一次大模型调用同时完成安全检查、意图分析和查询增强
+
+        返回 任务名 -> 结果对象或异常；某项子结果无效时存放异常，由对应环节走回退逻辑。
+        三项结果均已在结果缓存中时返回None，各环节直接命中缓存。
+        """
+        kinds = ("safety", "intent", "enhancement") if self.config.enable_query_enhancement else ("safety", "intent")
+
+        evidence = frozenset(self.config.safety_config.matcher.scan(query))
+        if self.result_cache:
+            cached_safety = await self._cache_get("safety", query, query_vector, evidence)
+            cached_intent = await self._cache_get("intent", query, query_vector) if cached_safety is not None else None
+            if cached_safety is not None and cached_intent is not None and (
+                "enhancement" not in kinds or await self._cache_get(
+                    "enhancement", query, scope=(cached_intent.intent_type, cached_safety.safety_level)
+                ) is not None
+            ):
+                logger.debug("合并分析命中结果缓存")
+                return None
 
+        try:
+            logger.debug(f"发送合并分析请求到大模型，查询长度: {len(query)}")
+            data = self._parse_llm_json(await self._call_llm(self.combined_analysis_prompt.format(query=query)))
+        except Exception as e:
+            logger.error(f"大模型合并分析失败: {e}")
+            return {kind: e for kind in kinds}
+
+        builders = {
+            "safety": self._build_safety_result,
+            "intent": self._build_intent_result,
+            "enhancement": self._build_enhancement_result
+        }
+        prefetched: Dict[str, Any] = {}
+        for kind in kinds:
+            section = data.get(kind)
             try:
-                result = json.loads(response_clean)
-            except json.JSONDecodeError as e:
-                raise Exception(f"JSON解析失败: {e}, 响应内容: {response_clean[:200]}")
+                if not isinstance(section, dict):
+                    raise Exception(f"大模型响应缺少必要字段: {kind}")
+                prefetched[kind] = builders[kind](section)
+            except Exception as e:
+                logger.warning(f"合并分析的 {kind} 子结果无效: {e}")
+                prefetched[kind] = e
+
+        # 有效子结果写入结果缓存，后续相同或相似查询可直接复用
+        if self.result_cache:
+            safety_result = prefetched["safety"]
+            intent_result = prefetched["intent"]
+            if isinstance(safety_result, SafetyCheckResult):
+                await self._cache_put("safety", query, safety_result, query_vector, evidence)
+            if isinstance(intent_result, IntentAnalysisResult):
+                await self._cache_put("intent", query, intent_result, query_vector)
+                enhancement_result = prefetched.get("enhancement")
+                if isinstance(safety_result, SafetyCheckResult) and isinstance(enhancement_result, QueryEnhancementResult):
+                    await self._cache_put(
+                        "enhancement", query, enhancement_result,
+                        scope=(intent_result.intent_type, safety_result.safety_level)
+                    )
 
-            # 验证必要字段
-            required_fields = ["is_safe", "safety_level", "confidence", "reason"]
-            for field in required_fields:
-                if field not in result:
-                    raise Exception(f"大模型响应缺少必要字段: {field}")
+        logger.debug("大模型合并分析完成")
+        return prefetched
+
+    async def _cache_get(self, kind: str, query: str, query_vector: Optional[_LazyQueryVector] = None,
+                         evidence=None, scope=None):
+        """先按归一化查询精确查找；未命中且该类结果支持语义复用时才计算查询向量做相似查找"""
+        if not self.result_cache:
+            return None
+        cached = self.result_cache.get_exact(kind, query, evidence, scope)
+        if cached is not None or query_vector is None or not self.result_cache.is_semantic(kind):
+            return cached
+        return self.result_cache.get_similar(kind, await query_vector.get(), evidence, scope)
+
+    async def _cache_put(self, kind: str, query: str, result, query_vector: Optional[_LazyQueryVector] = None,
+                         evidence=None, scope=None):
+        """写入结果缓存；支持语义复用的类型同时保存查询向量（此时通常已在查找时算好）"""
+        if not self.result_cache:
+            return
+        vector = None
+        if query_vector is not None and self.result_cache.is_semantic(kind):
+            vector = await query_vector.get()
+        self.result_cache.put(kind, query, result, vector, evidence, scope)
+
+    @staticmethod
+    def _take_prefetched(prefetched: Optional[Dict[str, Any]], kind: str):
+        """取出合并分析的子结果；子结果无效时抛出其异常以触发回退"""
+        result = prefetched.get(kind) if prefetched else None
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _llm_safety_check(self, query: str, query_vector=None,
+                                prefetched: Optional[Dict[str, Any]] = None) -> SafetyCheckResult:
+        """使用大模型进行安全检查（相似查询需命中完全相同的风险/教育/实施关键词才复用缓存结果）"""
+        if not self.llm_func:
+            raise Exception("LLM函数未提供")
 
-            logger.debug(f"大模型安全检查成功: {result.get('safety_level')}")
+        result = self._take_prefetched(prefetched, "safety")
+        if result is not None:
+            return result
 
-            return SafetyCheckResult(
-                is_safe=result.get("is_safe", True),
-                safety_level=result.get("safety_level", "safe"),
-                risk_factors=result.get("risk_factors", []),
-                confidence=result.get("confidence", 0.8),
-                reason=result.get("reason", "大模型安全检查"),
-                intent_direction=result.get("intent_direction")
-            )
+        evidence = frozenset(self.config.safety_config.matcher.scan(query))
+        cached = await self._cache_get("safety", query, query_vector, evidence)
+        if cached is not None:
+            logger.debug("安全检查命中结果缓存")
+            return cached
+
+        try:
+            prompt = self.safety_check_prompt.format(query=query)
+            logger.debug(f"发送安全检查请求到大模型，查询长度: {len(query)}")
+
+            safety_result = self._build_safety_result(self._parse_llm_json(await self._call_llm(prompt)))
+            logger.debug(f"大模型安全检查成功: {safety_result.safety_level}")
+
+            await self._cache_put("safety", query, safety_result, query_vector, evidence)
+            return safety_result
 
         except Exception as e:
             logger.error(f"大模型安全检查失败: {e}")
@@ -447,21 +799,19 @@ class IntentRecognitionProcessor:
 
     async def _basic_safety_check(self, query: str) -> SafetyCheckResult:
         """基础安全检查（规则基础）"""
-        # 使用工具类进行基础检查
-        illegal_keywords = [
-            "赌博", "毒品", "色情", "暴力", "诈骗", "非法", "违法",
-            "gambling", "drugs", "pornography", "violence", "fraud"
-        ]
-
-        risk_score = QueryUtils.calculate_risk_score(
-            query, illegal_keywords, self.educational_patterns, self.instructive_patterns
+        # 第一阶段：关键词单次扫描（匹配器按关键词组合缓存）
+        hits, has_edu, has_instr = QueryUtils.scan_risk_keywords(
+            query, _BASIC_ILLEGAL_KEYWORDS, self.educational_patterns, self.instructive_patterns
         )
+        risk_score = QueryUtils.keyword_risk_score(hits, has_edu, has_instr)
 
+        # 第二阶段：关键词评分已判定为非法时结论不会再变，跳过可疑模式正则
         safety_level = QueryUtils.determine_safety_level(risk_score)
+        if safety_level != "illegal":
+            risk_score = min(risk_score + QueryUtils.suspicious_pattern_score(query), 2.0)
+            safety_level = QueryUtils.determine_safety_level(risk_score)
         is_safe = safety_level == "safe"
 
-        hits = QueryUtils.find_illegal_hits(query, illegal_keywords)
-
         return SafetyCheckResult(
             is_safe=is_safe,
             safety_level=safety_level,
@@ -470,14 +820,15 @@ class IntentRecognitionProcessor:
             reason="基础规则检查"
         )
 
-    async def _intent_analysis(self, query: str) -> IntentAnalysisResult:
+    async def _intent_analysis(self, query: str, query_vector=None,
+                               prefetched: Optional[Dict[str, Any]] = None) -> IntentAnalysisResult:
         """意图分析 - 优先使用大模型，失败时回退到规则分析"""
         try:
             # 第一优先级：使用大模型分析
             if self.config.enable_llm and self.llm_func:
                 try:
                     logger.debug("尝试使用大模型进行意图分析")
-                    result = await self._llm_intent_analysis(query)
+                    result = await self._llm_intent_analysis(query, query_vector, prefetched)
                     logger.debug("大模型意图分析成功")
                     return result
                 except Exception as e:
@@ -487,9 +838,8 @@ class IntentRecognitionProcessor:
             # 第二优先级：回退到规则分析
             logger.debug("使用规则进行意图分析")
             result = await self._basic_intent_analysis(query)
-            # 标记为回退结果
-            result.reason = result.reason + " (规则回退)"
-            return result
+            # 标记为回退结果（结果对象只读，替换字段生成新实例）
+            return result.replace(reason=result.reason + " (规则回退)")
 
         except Exception as e:
             logger.error(f"所有意图分析方法都失败: {e}")
@@ -500,62 +850,30 @@ class IntentRecognitionProcessor:
                 keywords=[]
             )
 
-    async def _llm_intent_analysis(self, query: str) -> IntentAnalysisResult:
+    async def _llm_intent_analysis(self, query: str, query_vector=None,
+                                   prefetched: Optional[Dict[str, Any]] = None) -> IntentAnalysisResult:
         """使用大模型进行意图分析"""
         if not self.llm_func:
             raise Exception("LLM函数未提供")
 
+        result = self._take_prefetched(prefetched, "intent")
+        if result is not None:
+            return result
+
+        cached = await self._cache_get("intent", query, query_vector)
+        if cached is not None:
+            logger.debug("意图分析命中结果缓存")
+            return cached
+
         try:
             prompt = self.intent_analysis_prompt.format(query=query)
             logger.debug(f"发送意图分析请求到大模型，查询长度: {len(query)}")
 
-            response = await self.llm_func(prompt)
-
-            if not response or not response.strip():
-                raise Exception("大模型返回空响应")
-
-            # 处理包含 <think> 标签的响应
-            if "<think>" in response and "</think>" in response:
-                _, response = extracted_think_and_answer(response)
-
-            # 清理响应格式
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
+            intent_result = self._build_intent_result(self._parse_llm_json(await self._call_llm(prompt)))
+            logger.debug(f"大模型意图分析成功: {intent_result.intent_type}")
 
-            if not response_clean:
-                raise Exception("清理后的响应为空")
-
-            try:
-                result = json.loads(response_clean)
-            except json.JSONDecodeError as e:
-                raise Exception(f"JSON解析失败: {e}, 响应内容: {response_clean[:200]}")
-
-            # 验证必要字段
-            required_fields = ["intent_type", "confidence", "reason"]
-            for field in required_fields:
-                if field not in result:
-                    raise Exception(f"大模型响应缺少必要字段: {field}")
-
-            # 验证intent_type是否有效
-            intent_type_str = result.get("intent_type", "unclear")
-            try:
-                QueryIntentType(intent_type_str)
-            except ValueError:
-                logger.warning(f"无效的意图类型: {intent_type_str}，使用unclear")
-                intent_type_str = "unclear"
-
-            logger.debug(f"大模型意图分析成功: {intent_type_str}")
-
-            return IntentAnalysisResult(
-                intent_type=intent_type_str,
-                confidence=result.get("confidence", 0.8),
-                reason=result.get("reason", "大模型意图分析"),
-                keywords=result.get("keywords", [])
-            )
+            await self._cache_put("intent", query, intent_result, query_vector)
+            return intent_result
 
         except Exception as e:
             logger.error(f"大模型意图分析失败: {e}")
@@ -564,11 +882,9 @@ class IntentRecognitionProcessor:
 
     async def _basic_intent_analysis(self, query: str) -> IntentAnalysisResult:
         """基础意图分析（规则基础）"""
-        query_lower = query.lower()
-
         # 特殊：若包含教育/防范导向词，优先视为知识查询或程序性问题
         if QueryUtils.has_educational_intent(query, self.educational_patterns):
-            if any(w in query_lower for w in ["如何", "怎样", "怎么", "how"]):
+            if _HOW_QUESTION_RE.search(query):
                 return IntentAnalysisResult(
                     intent_type="procedural_question",
                     confidence=0.8,
@@ -582,15 +898,15 @@ class IntentRecognitionProcessor:
                 keywords=["教育", "知识"]
             )
 
-        # 检查每种意图类型的模式
-        for intent_type, patterns in self.intent_patterns.items():
+        # 检查每种意图类型的模式（预编译正则忽略大小写）
+        for intent_type, patterns in self.intent_patterns:
             for pattern in patterns:
-                if re.search(pattern, query_lower):
+                if pattern.search(query):
                     return IntentAnalysisResult(
                         intent_type=intent_type,
                         confidence=0.7,
-                        reason=f"匹配模式: {pattern}",
-                        keywords=[pattern]
+                        reason=f"匹配模式: {pattern.pattern}",
+                        keywords=[pattern.pattern]
                     )
 
         return IntentAnalysisResult(
@@ -600,14 +916,15 @@ class IntentRecognitionProcessor:
             keywords=[]
         )
 
-    async def _query_enhancement(self, query: str, intent_type: str, safety_level: str) -> QueryEnhancementResult:
+    async def _query_enhancement(self, query: str, intent_type: str, safety_level: str,
+                                 prefetched: Optional[Dict[str, Any]] = None) -> QueryEnhancementResult:
         """查询增强 - 优先使用大模型，失败时回退到模板增强"""
         try:
             # 第一优先级：使用大模型增强
             if self.config.enable_llm and self.llm_func:
                 try:
                     logger.debug("尝试使用大模型进行查询增强")
-                    result = await self._llm_query_enhancement(query, intent_type, safety_level)
+                    result = await self._llm_query_enhancement(query, intent_type, safety_level, prefetched)
                     logger.debug("大模型查询增强成功")
                     return result
                 except Exception as e:
@@ -619,7 +936,7 @@ class IntentRecognitionProcessor:
             result = await self._template_enhancement(query, intent_type)
             # 标记为回退结果
             if result.should_enhance:
-                result.enhancement_reason = result.enhancement_reason + " (模板回退)"
+                result = result.replace(enhancement_reason=result.enhancement_reason + " (模板回退)")
             return result
 
         except Exception as e:
@@ -631,59 +948,33 @@ class IntentRecognitionProcessor:
                 suggestions=[]
             )
 
-    async def _llm_query_enhancement(self, query: str, intent_type: str, safety_level: str) -> QueryEnhancementResult:
-        """使用大模型进行查询增强"""
+    async def _llm_query_enhancement(self, query: str, intent_type: str, safety_level: str,
+                                     prefetched: Optional[Dict[str, Any]] = None) -> QueryEnhancementResult:
+        """使用大模型进行查询增强（增强后的查询与原文强相关，缓存只做精确命中）"""
         if not self.llm_func:
             raise Exception("LLM函数未提供")
 
+        result = self._take_prefetched(prefetched, "enhancement")
+        if result is not None:
+            return result
+
+        scope = (intent_type, safety_level)
+        cached = await self._cache_get("enhancement", query, scope=scope)
+        if cached is not None:
+            logger.debug("查询增强命中结果缓存")
+            return cached
+
         try:
             prompt = self.query_enhancement_prompt.format(
                 query=query, intent_type=intent_type, safety_level=safety_level
             )
             logger.debug(f"发送查询增强请求到大模型，查询长度: {len(query)}")
 
-            response = await self.llm_func(prompt)
-
-            if not response or not response.strip():
-                raise Exception("大模型返回空响应")
+            enhancement_result = self._build_enhancement_result(self._parse_llm_json(await self._call_llm(prompt)))
+            logger.debug(f"大模型查询增强成功: 是否增强={enhancement_result.should_enhance}")
 
-            # 处理包含 <think> 标签的响应
-            if "<think>" in response and "</think>" in response:
-                _, response = extracted_think_and_answer(response)
-
-            # 清理响应格式
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
-
-            if not response_clean:
-                raise Exception("清理后的响应为空")
-
-            try:
-                result = json.loads(response_clean)
-            except json.JSONDecodeError as e:
-                raise Exception(f"JSON解析失败: {e}, 响应内容: {response_clean[:200]}")
-
-            # 验证必要字段
-            required_fields = ["should_enhance", "enhancement_reason"]
-            for field in required_fields:
-                if field not in result:
-                    raise Exception(f"大模型响应缺少必要字段: {field}")
-
-            should_enhance = result.get("should_enhance", False)
-            enhanced_query = result.get("enhanced_query") if should_enhance else None
-
-            logger.debug(f"大模型查询增强成功: 是否增强={should_enhance}")
-
-            return QueryEnhancementResult(
-                should_enhance=should_enhance,
-                enhanced_query=enhanced_query,
-                enhancement_reason=result.get("enhancement_reason", "大模型增强"),
-                suggestions=result.get("suggestions", [])
-            )
+            await self._cache_put("enhancement", query, enhancement_result, scope=scope)
+            return enhancement_result
 
         except Exception as e:
             logger.error(f"大模型查询增强失败: {e}")
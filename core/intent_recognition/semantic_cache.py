@@ -0,0 +1,187 @@
+"""
+意图识别结果缓存
+大模型的安全检查、意图分析、查询增强结果按查询复用：
+归一化查询完全相同时直接命中，否则按查询向量的余弦相似度命中，支持证据校验、TTL过期和LRU淘汰
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_cache_key(query: str) -> str:
+    """查询的缓存键：小写并合并空白"""
+    return " ".join(query.lower().split())
+
+
+def normalize_vector(embedding: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    """将向量归一化为单位长度，空向量或零向量返回None"""
+    if embedding is None:
+        return None
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    if vec.ndim != 1 or not norm:
+        return None
+    return vec / norm
+
+
+class _CacheTable:
+    """单一结果类型的缓存表
+
+    条目存放在固定容量的槽位中，向量按槽位连续存放便于一次矩阵乘法求全部相似度；
+    slots 记录 归一化查询 -> 槽位 并维护LRU顺序。
+    """
+
+    __slots__ = ("capacity", "threshold", "slots", "keys", "entries", "vectors", "has_vector", "free")
+
+    def __init__(self, capacity: int, threshold: Optional[float]):
+        self.capacity = capacity
+        # 语义命中阈值，None 表示只做精确命中
+        self.threshold = threshold
+        self.slots: "OrderedDict[str, int]" = OrderedDict()
+        # 槽位 -> 归一化查询 / (结果, 证据, 过期时间)
+        self.keys: List[Optional[str]] = []
+        self.entries: List[Optional[Tuple[Any, Hashable, float]]] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.has_vector = np.zeros(capacity, dtype=bool)
+        # 过期删除后空出的槽位
+        self.free: List[int] = []
+
+    def _drop(self, slot: int):
+        del self.slots[self.keys[slot]]
+        self.keys[slot] = None
+        self.entries[slot] = None
+        self.has_vector[slot] = False
+        self.free.append(slot)
+
+    def _accepts(self, vector: Optional[np.ndarray]) -> bool:
+        return vector is not None and (self.vectors is None or self.vectors.shape[1] == vector.shape[0])
+
+    def _candidates(self, vector: np.ndarray) -> List[int]:
+        """相似度不低于阈值的槽位，按相似度从高到低排列"""
+        n = len(self.keys)
+        if self.vectors is None or not n:
+            return []
+        sims = self.vectors[:n] @ vector
+        sims[~self.has_vector[:n]] = -np.inf
+        idx = np.flatnonzero(sims >= self.threshold)
+        return idx[np.argsort(-sims[idx])].tolist()
+
+    def get_exact(self, key: str, evidence: Hashable, now: float) -> Any:
+        slot = self.slots.get(key)
+        return None if slot is None else self._take([slot], evidence, now)
+
+    def get_similar(self, vector: np.ndarray, evidence: Hashable, now: float) -> Any:
+        if self.threshold is None or not self._accepts(vector):
+            return None
+        return self._take(self._candidates(vector), evidence, now)
+
+    def _take(self, candidates: List[int], evidence: Hashable, now: float) -> Any:
+        """按顺序返回第一个未过期且证据一致的候选结果"""
+        for slot in candidates:
+            result, entry_evidence, expires = self.entries[slot]
+            if expires <= now:
+                self._drop(slot)
+                continue
+            # 证据不一致时不复用（例如命中的风险关键词不同）
+            if entry_evidence != evidence:
+                continue
+            self.slots.move_to_end(self.keys[slot])
+            return result
+        return None
+
+    def put(self, key: str, vector: Optional[np.ndarray], evidence: Hashable, result: Any, expires: float):
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            elif len(self.keys) < self.capacity:
+                slot = len(self.keys)
+                self.keys.append(None)
+                self.entries.append(None)
+            else:
+                # 已满，淘汰最久未使用的条目
+                _, slot = self.slots.popitem(last=False)
+            self.keys[slot] = key
+        self.slots[key] = slot
+        self.slots.move_to_end(key)
+        self.entries[slot] = (result, evidence, expires)
+
+        if self._accepts(vector):
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            self.vectors[slot] = vector
+            self.has_vector[slot] = True
+        else:
+            self.has_vector[slot] = False
+
+
+class IntentResultCache:
+    """大模型分析结果缓存（TTL + LRU）
+
+    按结果类型（及作用域，如查询增强的意图类型和安全级别）分表存放；
+    thresholds 为各结果类型的语义命中阈值，未配置或为None的类型只做精确命中。
+    调用方先做精确查找，未命中且 is_semantic 时再计算查询向量做相似查找，精确重复的查询无需向量化。
+    """
+
+    def __init__(self, capacity: int, ttl: float, thresholds: Optional[Dict[str, Optional[float]]] = None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.thresholds = dict(thresholds or {})
+        self._tables: Dict[Tuple[str, Hashable], _CacheTable] = {}
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+
+    def is_semantic(self, kind: str) -> bool:
+        """该类结果是否支持按向量相似度命中"""
+        return self.thresholds.get(kind) is not None
+
+    def get_exact(self, kind: str, query: str, evidence: Hashable = None, scope: Hashable = None) -> Any:
+        """按归一化查询精确查找可复用的结果，未命中返回None"""
+        self.lookups += 1
+        table = self._tables.get((kind, scope))
+        if table is None:
+            return None
+        result = table.get_exact(normalize_cache_key(query), evidence, time.monotonic())
+        if result is not None:
+            self.exact_hits += 1
+        return result
+
+    def get_similar(self, kind: str, vector: Optional[np.ndarray], evidence: Hashable = None,
+                    scope: Hashable = None) -> Any:
+        """按查询向量的余弦相似度查找可复用的结果（应在精确查找未命中后调用），未命中返回None"""
+        table = self._tables.get((kind, scope))
+        if table is None or vector is None:
+            return None
+        result = table.get_similar(vector, evidence, time.monotonic())
+        if result is not None:
+            self.semantic_hits += 1
+        return result
+
+    def put(self, kind: str, query: str, result: Any, vector: Optional[np.ndarray] = None,
+            evidence: Hashable = None, scope: Hashable = None):
+        """写入结果"""
+        table = self._tables.get((kind, scope))
+        if table is None:
+            table = self._tables[(kind, scope)] = _CacheTable(self.capacity, self.thresholds.get(kind))
+        table.put(normalize_cache_key(query), vector, evidence, result, time.monotonic() + self.ttl)
+
+    def clear(self):
+        """清空缓存（提示词或配置变更后调用）"""
+        self._tables.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": sum(len(table.slots) for table in self._tables.values()),
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0
+        }
+
+
+__all__ = ["IntentResultCache", "normalize_cache_key", "normalize_vector"]
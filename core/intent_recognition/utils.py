@@ -2,84 +2,193 @@
 意图识别工具函数
 优化版本 - 适配项目架构
 """
+import json
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Dict, Any, Iterable, Mapping, Pattern, Set, Tuple
 from common.logging_utils import logger_manager
 
+try:
+    import orjson
+except ImportError:  # orjson不可用时使用标准库json
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick不可用时逐个关键词做子串查找
+    ahocorasick = None
+
 logger = logger_manager.get_logger("intent_utils")
 
+# 查询清理用的预编译正则：连续空白（分组1）合并为单个空格，特殊字符（基本标点除外）直接删除，
+# 使“赌@博”这类夹杂符号的关键词还原为“赌博”
+_NORMALIZE_RE = re.compile(r'(\s+)|[^\w\s\u4e00-\u9fff.,!?;:()（）。，！？；：]+')
+
+
+def _normalize_replacement(match: "re.Match") -> str:
+    return ' ' if match.group(1) else ''
+
+# 可疑模式（预编译，忽略大小写，无需先转小写）
+_SUSPICIOUS_SOURCES = (
+    r"如何.*违法", r"怎样.*犯罪", r"教我.*非法",
+    r"制作.*毒品", r"购买.*枪支", r"(如何|怎么|怎样).*实施",
+    r"how to.*illegal", r"where to buy.*drugs"
+)
+_SUSPICIOUS_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in _SUSPICIOUS_SOURCES)
+# 所有可疑模式的合并正则，未命中时跳过逐个模式的计分
+_SUSPICIOUS_ANY = re.compile("|".join(f"(?:{pattern})" for pattern in _SUSPICIOUS_SOURCES), re.IGNORECASE)
+
+
+def loads_json(data: str) -> Any:
+    """解析JSON文本（优先使用orjson，解析失败统一抛出json.JSONDecodeError）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json_file(file_path: str) -> Any:
+    """以字节方式读取并解析JSON文件（优先使用orjson）"""
+    data = Path(file_path).read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def dump_json_bytes(data: Any) -> bytes:
+    """将数据序列化为缩进2格的UTF-8 JSON字节（优先使用orjson）"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+class KeywordMatcher:
+    """多类别关键词匹配器
+
+    所有类别的关键词（忽略大小写）编译进同一个Aho-Corasick自动机，对文本单次扫描即可得到各类别的命中。
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        # 类别 -> [(原始关键词, 小写关键词)]，保持配置中的顺序
+        self._groups: Dict[str, List[Tuple[str, str]]] = {
+            category: [(keyword, keyword.lower()) for keyword in keywords if keyword]
+            for category, keywords in groups.items()
+        }
+        # 小写关键词 -> 所属类别
+        self._categories: Dict[str, frozenset] = {}
+        for category, pairs in self._groups.items():
+            for _, lowered in pairs:
+                self._categories[lowered] = self._categories.get(lowered, frozenset()) | {category}
+
+        self._ac = None
+        if ahocorasick is not None and self._categories:
+            self._ac = ahocorasick.Automaton()
+            for lowered, categories in self._categories.items():
+                self._ac.add_word(lowered, (lowered, categories))
+            self._ac.make_automaton()
+
+    def scan(self, text: str) -> Set[str]:
+        """返回文本中命中的全部小写关键词"""
+        text_lower = text.lower()
+        if self._ac is not None:
+            return {lowered for _, (lowered, _) in self._ac.iter(text_lower)}
+        return {lowered for lowered in self._categories if lowered in text_lower}
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """按类别返回命中的原始关键词（顺序与配置一致）"""
+        hits = self.scan(text)
+        return {
+            category: [keyword for keyword, lowered in pairs if lowered in hits]
+            for category, pairs in self._groups.items()
+        }
+
+    def contains(self, text: str, category: str) -> bool:
+        """文本是否命中指定类别的关键词，命中第一个即返回"""
+        text_lower = text.lower()
+        if self._ac is not None:
+            return any(category in categories for _, (_, categories) in self._ac.iter(text_lower))
+        return any(lowered in text_lower for _, lowered in self._groups.get(category, ()))
+
+
+@lru_cache(maxsize=64)
+def _cached_keyword_matcher(illegal: Tuple[str, ...] = (), educational: Tuple[str, ...] = (),
+                            instructive: Tuple[str, ...] = ()) -> KeywordMatcher:
+    """按关键词组合缓存的匹配器，同一组关键词只构建一次自动机"""
+    return KeywordMatcher({"illegal": illegal, "educational": educational, "instructive": instructive})
+
+
+# 安全替代建议的主题关键词
+_ALTERNATIVE_TOPICS = KeywordMatcher({
+    "gambling": ("赌博", "gambling"),
+    "drugs": ("毒品", "drugs"),
+    "fraud": ("诈骗", "fraud", "scam")
+})
+
 
 class QueryUtils:
     """查询处理工具类"""
     
     @staticmethod
-    async def clean_and_normalize_query(query: str) -> str:
-        """清理和标准化查询"""
+    def clean_and_normalize_query(query: str) -> str:
+        """清理和标准化查询（纯文本处理，同步执行）"""
         if not query:
             return ""
         
-        # 去除多余空格
-        query = re.sub(r'\s+', ' ', query.strip())
-        
-        # 去除特殊字符（保留基本标点）
-        query = re.sub(r'[^\w\s\u4e00-\u9fff.,!?;:()（）。，！？；：]', '', query)
-        
-        return query
+        # 合并空白并去除特殊字符（保留基本标点），单次扫描完成
+        return _NORMALIZE_RE.sub(_normalize_replacement, query).strip()
     
     @staticmethod
     def find_illegal_hits(query: str, illegal_keywords: List[str]) -> List[str]:
         """查找命中的非法关键词"""
-        hits = []
-        query_lower = query.lower()
-        
-        for keyword in illegal_keywords:
-            if keyword.lower() in query_lower:
-                hits.append(keyword)
-        
-        return hits
+        return _cached_keyword_matcher(illegal=tuple(illegal_keywords)).find(query)["illegal"]
     
     @staticmethod
     def has_educational_intent(query: str, educational_patterns: List[str]) -> bool:
         """检查是否有教育/防范意图"""
-        query_lower = query.lower()
-        return any(pattern.lower() in query_lower for pattern in educational_patterns)
+        return _cached_keyword_matcher(educational=tuple(educational_patterns)).contains(query, "educational")
     
     @staticmethod
     def has_instructive_intent(query: str, instructive_patterns: List[str]) -> bool:
         """检查是否有实施/教程意图"""
-        query_lower = query.lower()
-        return any(pattern.lower() in query_lower for pattern in instructive_patterns)
+        return _cached_keyword_matcher(instructive=tuple(instructive_patterns)).contains(query, "instructive")
+    
+    @staticmethod
+    def scan_risk_keywords(query: str, illegal_keywords: List[str],
+                           educational_patterns: List[str],
+                           instructive_patterns: List[str]) -> Tuple[List[str], bool, bool]:
+        """第一阶段：一次扫描得到命中的非法关键词，以及是否含教育导向、实施导向"""
+        found = _cached_keyword_matcher(
+            tuple(illegal_keywords), tuple(educational_patterns), tuple(instructive_patterns)
+        ).find(query)
+        return found["illegal"], bool(found["educational"]), bool(found["instructive"])
+    
+    @staticmethod
+    def keyword_risk_score(hits: List[str], has_edu: bool, has_instr: bool) -> float:
+        """关键词部分的风险评分"""
+        if not hits:
+            return 0.0
+        if has_edu and not has_instr:
+            return 0.3  # 教育导向，降低风险
+        return 1.2  # 明显非法且有实施导向
+    
+    @staticmethod
+    def suspicious_pattern_score(query: str) -> float:
+        """第二阶段：可疑模式部分的风险评分（先用合并正则判断是否有任一模式命中）"""
+        if not _SUSPICIOUS_ANY.search(query):
+            return 0.0
+        return sum(0.8 for pattern in _SUSPICIOUS_PATTERNS if pattern.search(query))
     
     @staticmethod
     def calculate_risk_score(query: str, illegal_keywords: List[str], 
                            educational_patterns: List[str], 
                            instructive_patterns: List[str]) -> float:
         """计算风险评分"""
-        query_lower = query.lower()
-        risk_score = 0.0
-        
-        # 检查非法关键词
-        hits = QueryUtils.find_illegal_hits(query, illegal_keywords)
-        has_edu = QueryUtils.has_educational_intent(query, educational_patterns)
-        has_instr = QueryUtils.has_instructive_intent(query, instructive_patterns)
-        
-        if hits:
-            if has_edu and not has_instr:
-                risk_score += 0.3  # 教育导向，降低风险
-            else:
-                risk_score += 1.2  # 明显非法且有实施导向
-        
-        # 可疑模式检查
-        suspicious_patterns = [
-            r"如何.*违法", r"怎样.*犯罪", r"教我.*非法",
-            r"制作.*毒品", r"购买.*枪支", r"(如何|怎么|怎样).*实施",
-            r"how to.*illegal", r"where to buy.*drugs"
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.search(pattern, query_lower):
-                risk_score += 0.8
-        
+        hits, has_edu, has_instr = QueryUtils.scan_risk_keywords(
+            query, illegal_keywords, educational_patterns, instructive_patterns
+        )
+        risk_score = QueryUtils.keyword_risk_score(hits, has_edu, has_instr)
+        risk_score += QueryUtils.suspicious_pattern_score(query)
         return min(risk_score, 2.0)  # 最大风险评分为2.0
     
     @staticmethod
@@ -121,21 +230,21 @@ class QueryUtils:
         ]
         
         # 根据查询内容生成更具体的建议
-        query_lower = query.lower()
+        topics = _ALTERNATIVE_TOPICS.find(query)
         
-        if any(word in query_lower for word in ["赌博", "gambling"]):
+        if topics["gambling"]:
             alternatives.extend([
                 "如何识别网络赌博陷阱？",
                 "赌博成瘾如何寻求帮助？"
             ])
         
-        if any(word in query_lower for word in ["毒品", "drugs"]):
+        if topics["drugs"]:
             alternatives.extend([
                 "如何识别毒品的危害？",
                 "毒品预防教育的重要性"
             ])
         
-        if any(word in query_lower for word in ["诈骗", "fraud", "scam"]):
+        if topics["fraud"]:
             alternatives.extend([
                 "如何识别和防范网络诈骗？",
                 "遇到诈骗如何举报和维权？"
@@ -144,55 +253,108 @@ class QueryUtils:
         return alternatives[:3]  # 返回最多3个建议
 
 
+# 默认意图识别模式（只读，供所有处理器共享）
+_DEFAULT_INTENT_PATTERNS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "knowledge_query": (
+        r"什么是", r"介绍一下", r"解释", r"定义", r"概念",
+        r"what is", r"explain", r"define", r"describe"
+    ),
+    "factual_question": (
+        r"谁是", r"何时", r"哪里", r"多少", r"几个",
+        r"who is", r"when", r"where", r"how many", r"how much"
+    ),
+    "analytical_question": (
+        r"为什么", r"如何", r"怎样", r"分析", r"比较", r"评价",
+        r"why", r"how", r"analyze", r"compare", r"evaluate"
+    ),
+    "procedural_question": (
+        r"步骤", r"流程", r"方法", r"操作", r"教程", r"指南",
+        r"steps", r"process", r"method", r"tutorial", r"guide"
+    ),
+    "creative_request": (
+        r"创作", r"写", r"设计", r"生成", r"创造", r"编写",
+        r"create", r"write", r"design", r"generate", r"compose"
+    ),
+    "greeting": (
+        r"你好", r"您好", r"hi", r"hello", r"嗨", r"早上好", r"晚上好",
+        r"good morning", r"good evening", r"good afternoon"
+    )
+})
+
+# 默认教育导向模式（只读，供所有处理器共享）
+EDUCATIONAL_PATTERNS = (
+    "防范", "避免", "识别", "辨别", "举报", "报警", "危害", "风险", "法律后果",
+    "合规", "合法", "合规要求", "不良后果", "如何远离", "不该做", "违法与否",
+    "how to avoid", "how to report", "how to identify", "risk", "legal consequences"
+)
+
+# 默认实施导向模式（只读，供所有处理器共享）
+INSTRUCTIVE_PATTERNS = (
+    "实施", "教程", "步骤", "方法", "技巧", "购买", "在哪里买", "获取", "制作",
+    "how to", "guide", "step by step", "where to buy", "make", "build"
+)
+
+
 class IntentPatterns:
     """意图模式管理类"""
     
     @staticmethod
     def get_default_patterns() -> Dict[str, List[str]]:
-        """获取默认意图识别模式"""
-        return {
-            "knowledge_query": [
-                r"什么是", r"介绍一下", r"解释", r"定义", r"概念",
-                r"what is", r"explain", r"define", r"describe"
-            ],
-            "factual_question": [
-                r"谁是", r"何时", r"哪里", r"多少", r"几个",
-                r"who is", r"when", r"where", r"how many", r"how much"
-            ],
-            "analytical_question": [
-                r"为什么", r"如何", r"怎样", r"分析", r"比较", r"评价",
-                r"why", r"how", r"analyze", r"compare", r"evaluate"
-            ],
-            "procedural_question": [
-                r"步骤", r"流程", r"方法", r"操作", r"教程", r"指南",
-                r"steps", r"process", r"method", r"tutorial", r"guide"
-            ],
-            "creative_request": [
-                r"创作", r"写", r"设计", r"生成", r"创造", r"编写",
-                r"create", r"write", r"design", r"generate", r"compose"
-            ],
-            "greeting": [
-                r"你好", r"您好", r"hi", r"hello", r"嗨", r"早上好", r"晚上好",
-                r"good morning", r"good evening", r"good afternoon"
-            ]
-        }
+        """获取默认意图识别模式（返回可修改的副本）"""
+        return {intent_type: list(patterns) for intent_type, patterns in _DEFAULT_INTENT_PATTERNS.items()}
+    
+    @staticmethod
+    def compile(patterns: Dict[str, List[str]] = None) -> Tuple[Tuple[str, Tuple[Pattern, ...]], ...]:
+        """将意图模式预编译为 (意图类型, 正则元组) 的只读序列（忽略大小写，可直接匹配原始查询）"""
+        if patterns is None:
+            patterns = IntentPatterns.get_default_patterns()
+        return tuple(
+            (intent_type, tuple(re.compile(pattern, re.IGNORECASE) for pattern in intent_patterns))
+            for intent_type, intent_patterns in patterns.items()
+        )
     
     @staticmethod
     def get_educational_patterns() -> List[str]:
         """获取教育导向模式"""
-        return [
-            "防范", "避免", "识别", "辨别", "举报", "报警", "危害", "风险", "法律后果",
-            "合规", "合法", "合规要求", "不良后果", "如何远离", "不该做", "违法与否",
-            "how to avoid", "how to report", "how to identify", "risk", "legal consequences"
-        ]
+        return list(EDUCATIONAL_PATTERNS)
     
     @staticmethod
     def get_instructive_patterns() -> List[str]:
         """获取实施导向模式"""
-        return [
-            "实施", "教程", "步骤", "方法", "技巧", "购买", "在哪里买", "获取", "制作",
-            "how to", "guide", "step by step", "where to buy", "make", "build"
-        ]
+        return list(INSTRUCTIVE_PATTERNS)
+
+
+# 默认意图模式在导入时编译一次，供所有处理器实例共享
+PRECOMPILED_PATTERNS = IntentPatterns.compile(_DEFAULT_INTENT_PATTERNS)
+
+# 默认查询增强模板（只读，供所有处理器共享）
+DEFAULT_ENHANCEMENT_TEMPLATES: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "knowledge_query": (
+        "请详细解释{query}的概念、特点和应用场景",
+        "关于{query}，请提供全面的背景信息和相关知识",
+        "请从多个角度分析{query}的重要性和影响"
+    ),
+    "factual_question": (
+        "请提供关于{query}的准确事实信息和数据",
+        "关于{query}，请给出具体的时间、地点、人物等详细信息",
+        "请列出与{query}相关的关键事实和统计数据"
+    ),
+    "analytical_question": (
+        "请深入分析{query}，包括原因、影响和解决方案",
+        "关于{query}，请提供多角度的分析和见解",
+        "请系统性地分析{query}的各个方面和相互关系"
+    ),
+    "procedural_question": (
+        "请提供{query}的详细步骤和操作指南",
+        "关于{query}，请给出清晰的流程和注意事项",
+        "请列出{query}的具体方法和最佳实践"
+    ),
+    "creative_request": (
+        "请根据{query}的要求进行创意创作",
+        "关于{query}，请发挥创意并提供独特的见解",
+        "请以创新的方式回应{query}的需求"
+    )
+})
 
 
 class EnhancementTemplates:
@@ -200,39 +362,21 @@ class EnhancementTemplates:
     
     @staticmethod
     def get_default_templates() -> Dict[str, List[str]]:
-        """获取默认查询增强模板"""
-        return {
-            "knowledge_query": [
-                "请详细解释{query}的概念、特点和应用场景",
-                "关于{query}，请提供全面的背景信息和相关知识",
-                "请从多个角度分析{query}的重要性和影响"
-            ],
-            "factual_question": [
-                "请提供关于{query}的准确事实信息和数据",
-                "关于{query}，请给出具体的时间、地点、人物等详细信息",
-                "请列出与{query}相关的关键事实和统计数据"
-            ],
-            "analytical_question": [
-                "请深入分析{query}，包括原因、影响和解决方案",
-                "关于{query}，请提供多角度的分析和见解",
-                "请系统性地分析{query}的各个方面和相互关系"
-            ],
-            "procedural_question": [
-                "请提供{query}的详细步骤和操作指南",
-                "关于{query}，请给出清晰的流程和注意事项",
-                "请列出{query}的具体方法和最佳实践"
-            ],
-            "creative_request": [
-                "请根据{query}的要求进行创意创作",
-                "关于{query}，请发挥创意并提供独特的见解",
-                "请以创新的方式回应{query}的需求"
-            ]
-        }
+        """获取默认查询增强模板（返回可修改的副本）"""
+        return {intent_type: list(templates) for intent_type, templates in DEFAULT_ENHANCEMENT_TEMPLATES.items()}
 
 
 # 导出所有工具类
 __all__ = [
     "QueryUtils",
     "IntentPatterns", 
-    "EnhancementTemplates"
+    "EnhancementTemplates",
+    "PRECOMPILED_PATTERNS",
+    "EDUCATIONAL_PATTERNS",
+    "INSTRUCTIVE_PATTERNS",
+    "DEFAULT_ENHANCEMENT_TEMPLATES",
+    "loads_json",
+    "load_json_file",
+    "dump_json_bytes",
+    "KeywordMatcher"
 ]
@@ -35,7 +35,7 @@ SAFETY_LEVELS = {
 class QueryProcessor:
     """基于大模型的查询处理器 - 优化版本"""
 
-    def __init__(self, llm_func=None, config: ProcessorConfig = None):
+    def __init__(self, llm_func=None, config: ProcessorConfig = None, embedding_func=None):
         self.logger = logger_manager.setup_query_logger()
 
         # 初始化配置
@@ -49,7 +49,8 @@ class QueryProcessor:
         # 初始化核心处理器
         self.core_processor = IntentRecognitionProcessor(
             config=self.config,
-            llm_func=llm_func
+            llm_func=llm_func,
+            embedding_func=embedding_func
         )
 
         self.logger.info("查询处理器初始化完成")
@@ -126,6 +127,11 @@ class QueryProcessor:
                 if self.core_processor.sensitive_word_manager and
                    self.core_processor.sensitive_word_manager.dfa_filter
                 else None
+            ),
+            "result_cache_stats": (
+                self.core_processor.result_cache.get_stats()
+                if self.core_processor.result_cache
+                else None
             )
         }
 
@@ -7,6 +7,7 @@ from handler import guixiaoxirag_service, kb_manager
 from common.config import settings
 from common.logging_utils import logger_manager
 from common.utils import ensure_directory
+from core.common.llm_client import close_session, start_session_keepalive
 
 logger = logger_manager.setup_service_logger()
 
@@ -29,6 +30,9 @@ async def initialize_services():
         # 4. 初始化QA系统
         await initialize_qa_system()
 
+        # 5. 启动模型服务连接保活
+        start_session_keepalive()
+
         logger.info("所有核心服务初始化完成")
 
     except Exception as e:
@@ -100,6 +104,9 @@ async def cleanup_services():
         # 清理知识库管理器
         await cleanup_knowledge_base_manager()
 
+        # 关闭共享的HTTP会话
+        await close_session()
+
         logger.info("所有服务清理完成")
 
     except Exception as e: